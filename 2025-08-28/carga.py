@@ -0,0 +1,60 @@
+import argparse
+import threading
+import time
+
+import requests
+
+# Gera carga no node.py e mede a vazão de POST e GET /dados com
+# 1, 8 e 64 clientes concorrentes (cada cliente com sua sessão keep-alive).
+#
+# Exemplo: python carga.py --url http://localhost:8000/dados --duracao 5
+
+
+def rodar(clientes, duracao, operacao):
+    """Roda `operacao(sessao, i)` em `clientes` threads por `duracao` s;
+    devolve (requisições ok, erros)"""
+    ok = [0] * clientes
+    erros = [0] * clientes
+    fim = time.perf_counter() + duracao
+
+    def cliente(n):
+        sessao = requests.Session()
+        i = 0
+        while time.perf_counter() < fim:
+            try:
+                resp = operacao(sessao, i)
+                if resp.status_code < 300:
+                    ok[n] += 1
+                else:
+                    erros[n] += 1
+            except requests.exceptions.RequestException:
+                erros[n] += 1
+            i += 1
+
+    threads = [threading.Thread(target=cliente, args=(n,)) for n in range(clientes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(ok), sum(erros)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000/dados")
+    parser.add_argument("--duracao", type=float, default=5.0, help="Segundos por medição")
+    parser.add_argument("--clientes", type=int, nargs="+", default=[1, 8, 64])
+    args = parser.parse_args()
+
+    def post(sessao, i):
+        return sessao.post(args.url, json={"nome": f"carga{i % 16}", "mensagem": f"mensagem {i}"}, timeout=10)
+
+    def get(sessao, i):
+        # Uma página de 100 itens, como um cliente de chat lendo o histórico
+        return sessao.get(args.url, params={"since": (i * 100) % 10000, "limit": 100}, timeout=10)
+
+    print(f"{'operação':<10} {'clientes':>8} {'req/s':>10} {'erros':>6}")
+    for nome, operacao in (("POST", post), ("GET", get)):
+        for clientes in args.clientes:
+            ok, erros = rodar(clientes, args.duracao, operacao)
+            print(f"{nome:<10} {clientes:>8} {ok / args.duracao:>10.0f} {erros:>6}")
@@ -1,41 +1,61 @@
+import threading
+import time
+
 import requests
 
+from ClienteAnel import AnelIndisponivel, ClienteAnel
+
 
-def enviar_mensagem(base_url, nome, texto):
+def enviar_mensagem(cliente, nome, texto):
     msg = {"nome": nome, "mensagem": texto}
     try:
-        resp = requests.post(base_url, json=msg, timeout=5)
+        resp = cliente.inserir_item(msg)
         if resp.status_code == 202:
             print("Mensagem enviada com sucesso!")
         else:
             print("Erro ao enviar mensagem:", resp.status_code, resp.text)
-    except requests.exceptions.RequestException as e:
+    except (AnelIndisponivel, requests.exceptions.RequestException) as e:
         print("Erro de conexão:", e)
 
 
-def buscar_mensagens(base_url):
+def buscar_mensagens(cliente, desde=0):
+    """Mostra só as mensagens com seq maior que `desde`; devolve o último seq visto"""
     try:
-        resp = requests.get(base_url, timeout=5)
-        if resp.status_code == 200:
-            msgs = resp.json()
-            print("\n--- Chat ---")
-            for m in msgs:
-                print(f"{m['nome']}: {m['mensagem']}")
-            print("------------\n")
-        else:
-            print("Erro ao buscar mensagens:", resp.status_code, resp.text)
-    except requests.exceptions.RequestException as e:
+        print("\n--- Chat ---")
+        for item in cliente.ler(desde):
+            m = item["dado"]
+            print(f"{m['nome']}: {m['mensagem']}")
+            desde = item["seq"]
+        print("------------\n")
+    except (AnelIndisponivel, requests.exceptions.RequestException) as e:
         print("Erro de conexão:", e)
+    return desde
+
+
+def ouvir_mensagens(cliente, desde=0):
+    """Recebe as mensagens novas por Server-Sent Events (GET /dados/stream)
+    e as mostra assim que chegam. Reconecta a partir do último seq visto."""
+    while True:
+        try:
+            for desde, m in cliente.ouvir(desde):
+                print(f"\n{m['nome']}: {m['mensagem']}")
+        except (AnelIndisponivel, requests.exceptions.RequestException) as e:
+            print("Conexão com o chat perdida, reconectando...", e)
+            time.sleep(1)
 
 
 if __name__ == "__main__":
-    ip = input("Digite o IP do servidor (ex: 192.168.1.100): ").strip()
-    base_url = f"http://{ip}:8000/dados"
+    # Vários IPs separados por espaço: os seguintes servem de reserva
+    ips = input("Digite o IP do servidor (ex: 192.168.1.100): ").split()
+    cliente = ClienteAnel([f"http://{ip}:8000" for ip in ips])
     nome = input("Digite seu nome: ")
 
+    # Mostra o histórico uma vez e depois só recebe o que for empurrado
+    ultimo_seq = buscar_mensagens(cliente)
+    threading.Thread(target=ouvir_mensagens, args=(cliente, ultimo_seq), daemon=True).start()
+
     while True:
         texto = input("Digite sua mensagem (ou 'sair' para encerrar): ")
         if texto.lower() == "sair":
             break
-        enviar_mensagem(base_url, nome, texto)
-        buscar_mensagens(base_url)
+        enviar_mensagem(cliente, nome, texto)
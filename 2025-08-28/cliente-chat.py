@@ -1,34 +1,56 @@
+import threading
+import time
+
 import requests
 
-BASE_URL = "http://:8000/dados"
+from ClienteAnel import AnelIndisponivel, ClienteAnel
+
+cliente = ClienteAnel("http://:8000")
 
 
 def enviar_mensagem(nome, texto):
     msg = {"nome": nome, "mensagem": texto}
-    resp = requests.post(BASE_URL, json=msg)
+    resp = cliente.inserir_item(msg)
     if resp.status_code == 202:
         print("Mensagem enviada com sucesso!")
     else:
         print("Erro ao enviar mensagem:", resp.status_code, resp.text)
 
 
-def buscar_mensagens():
-    resp = requests.get(BASE_URL)
-    if resp.status_code == 200:
-        msgs = resp.json()
-        print("\n--- Chat ---")
-        for m in msgs:
+def buscar_mensagens(desde=0):
+    """Mostra só as mensagens com seq maior que `desde`; devolve o último seq visto"""
+    print("\n--- Chat ---")
+    try:
+        for item in cliente.ler(desde):
+            m = item["dado"]
             print(f"{m['nome']}: {m['mensagem']}")
-        print("------------\n")
-    else:
-        print("Erro ao buscar mensagens:", resp.status_code, resp.text)
+            desde = item["seq"]
+    except (AnelIndisponivel, requests.RequestException) as e:
+        print("Erro ao buscar mensagens:", e)
+    print("------------\n")
+    return desde
+
+
+def ouvir_mensagens(desde=0):
+    """Recebe as mensagens novas por Server-Sent Events (GET /dados/stream)
+    e as mostra assim que chegam. Reconecta a partir do último seq visto."""
+    while True:
+        try:
+            for desde, m in cliente.ouvir(desde):
+                print(f"\n{m['nome']}: {m['mensagem']}")
+        except (AnelIndisponivel, requests.RequestException) as e:
+            print("Conexão com o chat perdida, reconectando...", e)
+            time.sleep(1)
 
 
 if __name__ == "__main__":
     nome = input("Digite seu nome: ")
+
+    # Mostra o histórico uma vez e depois só recebe o que for empurrado
+    ultimo_seq = buscar_mensagens()
+    threading.Thread(target=ouvir_mensagens, args=(ultimo_seq,), daemon=True).start()
     while True:
         texto = input("Digite sua mensagem (ou 'sair' para encerrar): ")
         if texto.lower() == "sair":
             break
         enviar_mensagem(nome, texto)
-        buscar_mensagens()
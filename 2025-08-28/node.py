@@ -1,50 +1,375 @@
+import argparse
+import bisect
 import http.server
 import socketserver
 import json
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from typing import Optional
 
-PORT = 8000
-lista = []
+from Persistencia import LogSegmentado
+
+# Exemplo: python node.py [--porta 8000] [--pasta lista_node] [--persistencia nenhuma]
+parser = argparse.ArgumentParser()
+parser.add_argument("--porta", type=int, default=8000)
+parser.add_argument("--persistencia", choices=["segmentos", "nenhuma"], default="segmentos",
+                    help="segmentos: cada escrita vai para um log em disco (com fsync) antes da "
+                         "resposta, e a lista é relida dele na partida")
+parser.add_argument("--pasta", default="lista_node", help="Pasta do log e dos snapshots")
+parser.add_argument("--snapshot-mb", type=int, default=64,
+                    help="MB gravados no log entre um snapshot e o próximo")
+args = parser.parse_args()
+
+PORT = args.porta
+
+# Máximo de itens devolvidos por página em GET /dados?since=...
+LIMITE_PADRAO = 1000
+# Tempo máximo que um long-poll (GET /dados?since=N&espera=S) fica aberto
+ESPERA_MAXIMA = 60
+# Intervalo dos comentários ": ping" que mantêm o stream SSE vivo
+INTERVALO_PING = 15
+# Itens por pedaço (chunk) do GET /dados em NDJSON
+BLOCO_NDJSON = 1000
+# Itens por registro do snapshot da lista
+BLOCO_SNAPSHOT = 10000
+TIPO_NDJSON = "application/x-ndjson"
 
 # Criem um cliente em python usando a biblioteca requests
 # para inserir itens na lista do servidor e ler itens e
 # exibir para o usuário.
 
 
+class ArmazemMensagens:
+    """Lista de mensagens em ordem de chegada.
+
+    Cada item recebe um número de sequência (seq) que começa em 1 e nunca
+    muda, então um cliente pode pedir só o que chegou depois do último seq
+    que viu. `por_nome` indexa os seqs de cada remetente ("nome").
+
+    `cond` protege a lista e acorda quem está esperando itens novos
+    (long-poll e SSE).
+
+    Escritas concorrentes são agrupadas em lotes: cada POST entra numa fila
+    curta e o primeiro thread que encontra a fila sem líder aplica o lote
+    inteiro com uma só aquisição de `cond` e um só notify_all, enquanto os
+    outros só esperam o seq deles. Um POST /dados/batch entra na fila como
+    um pedido só, e os itens dele recebem seqs consecutivos.
+
+    Com `log`, o líder grava o lote inteiro como um registro (um fsync) antes
+    de aplicá-lo e de responder, e a lista começa com o que o log tiver.
+    """
+
+    def __init__(self, log: Optional[LogSegmentado] = None):
+        self.lista = []  # lista[seq - 1] é o item de número seq
+        self.por_nome = defaultdict(list)  # nome -> seqs em ordem crescente
+        self.cond = threading.Condition()
+        self.fila = []  # pedidos [dados, seq do último] ainda sem seq
+        self.fila_cond = threading.Condition()
+        self.aplicando = False  # já existe um líder aplicando lotes
+        self.log = log
+        if log is not None:
+            # Cada registro do log (e do snapshot) é uma lista de itens
+            log.recuperar(self._reaplicar)
+
+    def _reaplicar(self, dados: list):
+        for dado in dados:
+            self.lista.append(dado)
+            if isinstance(dado, dict) and "nome" in dado:
+                self.por_nome[str(dado["nome"])].append(len(self.lista))
+
+    def __len__(self):
+        return len(self.lista)
+
+    def todos(self) -> list:
+        with self.cond:
+            return list(self.lista)
+
+    def adicionar(self, dado) -> int:
+        return self.adicionar_lote([dado])
+
+    def adicionar_lote(self, dados: list) -> int:
+        """Adiciona os itens em seqs consecutivos; devolve o seq do último.
+        Levanta OSError se a escrita não foi aceita."""
+        pedido = [dados, None]
+        with self.fila_cond:
+            self.fila.append(pedido)
+            # Sem líder (ou o anterior saiu por erro), este pedido assume
+            while pedido[1] is None and self.aplicando:
+                self.fila_cond.wait()
+            lider = pedido[1] is None
+            if lider:
+                self.aplicando = True
+        if lider:
+            self._aplicar_lotes()
+        if isinstance(pedido[1], OSError):
+            raise pedido[1]  # não foi para o disco: a escrita não é confirmada
+        if isinstance(pedido[1], Exception):
+            raise OSError(f"escrita não aplicada: {pedido[1]!r}") from pedido[1]
+        return pedido[1]
+
+    def _aplicar_lotes(self):
+        lote = []
+        try:
+            while True:
+                with self.fila_cond:
+                    lote, self.fila = self.fila, []
+                    if not lote:
+                        self.aplicando = False
+                        return
+                if self.log is not None:
+                    try:
+                        indice = self.log.acrescentar([dado for pedido in lote for dado in pedido[0]])
+                    except Exception as e:
+                        with self.fila_cond:
+                            for pedido in lote:
+                                pedido[1] = e
+                            self.fila_cond.notify_all()
+                        continue
+                with self.cond:
+                    for pedido in lote:
+                        for dado in pedido[0]:
+                            self.lista.append(dado)
+                            if isinstance(dado, dict) and "nome" in dado:
+                                self.por_nome[str(dado["nome"])].append(len(self.lista))
+                        pedido[1] = len(self.lista)
+                    tamanho = len(self.lista)
+                    self.cond.notify_all()
+                with self.fila_cond:
+                    self.fila_cond.notify_all()
+                if self.log is not None and self.log.precisa_snapshot():
+                    # Só o líder escreve, então a lista até `tamanho` é o estado do registro `indice`
+                    threading.Thread(target=self.log.snapshot, args=(indice, self._blocos(tamanho)),
+                                     daemon=True).start()
+        except Exception as e:
+            # Erro inesperado: o lote em curso recebe o erro e a liderança fica livre
+            with self.fila_cond:
+                for pedido in lote:
+                    if pedido[1] is None:
+                        pedido[1] = e
+                self.aplicando = False
+                self.fila_cond.notify_all()
+
+    def _blocos(self, tamanho: int):
+        # A lista só cresce: os itens antes de `tamanho` podem ser lidos sem o lock
+        for inicio in range(0, tamanho, BLOCO_SNAPSHOT):
+            yield self.lista[inicio:min(inicio + BLOCO_SNAPSHOT, tamanho)]
+
+    def ler(self, since: int = 0, limit: int = LIMITE_PADRAO, nome=None):
+        """Itens com seq > since (no máximo `limit`); devolve (itens, há mais)"""
+        with self.cond:
+            if nome is None:
+                seqs = range(since + 1, len(self.lista) + 1)
+            else:
+                indice = self.por_nome.get(nome, [])
+                seqs = indice[bisect.bisect_right(indice, since):]
+            pagina = seqs[:limit]
+            itens = [{"seq": seq, "dado": self.lista[seq - 1]} for seq in pagina]
+            return itens, len(seqs) > limit
+
+    def esperar(self, since: int, timeout: float, limit: int = LIMITE_PADRAO, nome=None):
+        """Como ler(), mas bloqueia até `timeout` segundos se não houver nada novo"""
+        limite = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                itens, mais = self.ler(since, limit, nome)
+                restante = limite - time.monotonic()
+                if itens or restante <= 0:
+                    return itens, mais
+                self.cond.wait(restante)
+
+
+if args.persistencia == "segmentos":
+    inicio = time.perf_counter()
+    armazem = ArmazemMensagens(LogSegmentado(args.pasta, snapshot_a_cada=args.snapshot_mb * 1024 * 1024))
+    print(f"{len(armazem)} itens recuperados de {args.pasta} em {time.perf_counter() - inicio:.2f} s")
+else:
+    armazem = ArmazemMensagens()
+
+
 class NossoHandler(http.server.BaseHTTPRequestHandler):
+    # Keep-alive: cada cliente reaproveita a conexão entre requisições
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _send_vazio(self, code):
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _send_json(self, code, payload):
+        dado = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(dado)))
+        self.end_headers()
+        self.wfile.write(dado)
+
+    def _ler_corpo(self) -> bytes:
+        """Corpo com Content-Length ou Transfer-Encoding: chunked. Levanta
+        ValueError se o tamanho (ou o de um pedaço) não é um número."""
+        if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        partes = []
+        while True:
+            tamanho = int(self.rfile.readline().split(b";")[0], 16)
+            if tamanho == 0:
+                # Fim do corpo (e trailers, se houver)
+                while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(partes)
+            partes.append(self.rfile.read(tamanho))
+            self.rfile.readline()
+
+    def _ler_lote(self, corpo: bytes) -> list:
+        """Itens de um POST /dados/batch: lista JSON ou NDJSON (um item por
+        linha). Levanta ValueError se alguma linha não for JSON."""
+        texto = corpo.decode("utf-8")
+        if TIPO_NDJSON not in self.headers.get("Content-Type", "") and texto.lstrip().startswith("["):
+            itens = json.loads(texto)
+            if not isinstance(itens, list):
+                raise ValueError("esperada uma lista JSON")
+            return itens
+        return [json.loads(linha) for linha in texto.splitlines() if linha.strip()]
+
+    def _ndjson(self, since, nome):
+        """GET /dados em NDJSON: um {"seq", "dado"} por linha, escrito em
+        pedaços de BLOCO_NDJSON itens, sem montar a lista inteira na memória"""
+        self.send_response(200)
+        self.send_header("Content-Type", f"{TIPO_NDJSON}; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        mais = True
+        while mais:
+            itens, mais = armazem.ler(since, BLOCO_NDJSON, nome)
+            if not itens:
+                break
+            pedaco = "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in itens).encode("utf-8")
+            self.wfile.write(f"{len(pedaco):X}\r\n".encode("ascii") + pedaco + b"\r\n")
+            since = itens[-1]["seq"]
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _stream(self, since, nome):
+        """Server-Sent Events: empurra cada item novo assim que chega"""
+        # Um cliente reconectando diz onde parou pelo Last-Event-ID
+        ultimo_evento = self.headers.get("Last-Event-ID", "")
+        if ultimo_evento.isdigit():
+            since = max(since, int(ultimo_evento))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        # Sem tamanho conhecido: o stream termina quando a conexão fecha
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            while True:
+                itens, _ = armazem.esperar(since, INTERVALO_PING, nome=nome)
+                if not itens:
+                    self.wfile.write(b": ping\n\n")
+                    continue
+                eventos = "".join(
+                    f"id: {item['seq']}\ndata: {json.dumps(item['dado'], ensure_ascii=False)}\n\n"
+                    for item in itens
+                )
+                self.wfile.write(eventos.encode("utf-8"))
+                since = itens[-1]["seq"]
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
     def do_GET(self):
-        if self.path == "/dados":
-            dado = json.dumps(lista, ensure_ascii=False).encode("utf-8")
-            self.send_response(200)
-            self.send_header("Content-Type", "application/json; charset=utf-8")
-            self.send_header("Content-Length", str(len(dado)))
-            self.end_headers()
-            self.wfile.write(dado)
+        url = urllib.parse.urlsplit(self.path)
+        if url.path not in ("/dados", "/dados/stream"):
+            self._send_vazio(404)
+            return
+
+        params = urllib.parse.parse_qs(url.query)
+        # NDJSON por ?formato=ndjson ou Accept: application/x-ndjson
+        ndjson = (params.pop("formato", [""])[0] == "ndjson"
+                  or TIPO_NDJSON in self.headers.get("Accept", ""))
+        if url.path == "/dados" and not params and not ndjson:
+            # Sem parâmetros: lista completa, como sempre foi
+            self._send_json(200, armazem.todos())
+            return
+
+        try:
+            since = int(params.get("since", ["0"])[0])
+            limit = min(int(params.get("limit", [LIMITE_PADRAO])[0]), LIMITE_PADRAO)
+            espera = min(float(params.get("espera", ["0"])[0]), ESPERA_MAXIMA)
+        except ValueError:
+            self._send_vazio(400)
+            return
+        if since < 0 or limit < 1:
+            # since negativo leria lista[-1]; limit < 1 daria "mais" para sempre
+            self._send_vazio(400)
+            return
+        nome = params.get("nome", [None])[0]
+
+        if url.path == "/dados/stream":
+            self._stream(since, nome)
+            return
+        if ndjson:
+            self._ndjson(since, nome)
+            return
+
+        if espera > 0:
+            itens, mais = armazem.esperar(since, espera, limit, nome)
         else:
-            self.send_response(404)
-            self.end_headers()
+            itens, mais = armazem.ler(since, limit, nome)
+        self._send_json(200, {"itens": itens, "tamanho": len(armazem), "mais": mais})
 
     def do_POST(self):
+        # Lê o corpo mesmo em 404: o que sobrasse dele na conexão keep-alive
+        # seria lido como a próxima requisição
+        try:
+            body = self._ler_corpo()
+        except ValueError:
+            # Sem saber onde o corpo termina, a conexão não serve para mais nada
+            self.close_connection = True
+            self._send_vazio(400)
+            return
         if self.path == "/dados":
-            length = int(self.headers.get("Content-Length", 0))
-            body = self.rfile.read(length).decode("utf-8")
             try:
-                dado = json.loads(body)
-                lista.append(dado)  # adiciona o conteúdo do JSON na lista
-                resp = {"status": "ok", "tamanho": len(lista)}
-                resp_bytes = json.dumps(resp, ensure_ascii=False).encode("utf-8")
-                self.send_response(202)
-                self.send_header("Content-Type", "application/json; charset=utf-8")
-                self.send_header("Content-Length", str(len(resp_bytes)))
-                self.end_headers()
-                self.wfile.write(resp_bytes)
-            except json.JSONDecodeError:
-                self.send_response(400)
-                self.end_headers()
+                dado = json.loads(body.decode("utf-8"))
+            except ValueError:  # inclui JSONDecodeError e UTF-8 inválido
+                self._send_vazio(400)
+                return
+            try:
+                seq = armazem.adicionar(dado)  # adiciona o conteúdo do JSON na lista
+            except OSError:
+                self._send_vazio(500)  # o log não gravou: a escrita não foi aceita
+                return
+            self._send_json(202, {"status": "ok", "tamanho": len(armazem), "seq": seq})
+        elif self.path == "/dados/batch":
+            # Vários itens em uma requisição e uma resposta só; um item
+            # inválido recusa o lote inteiro
+            try:
+                itens = self._ler_lote(body)
+            except ValueError:  # inclui JSONDecodeError e UTF-8 inválido
+                self._send_vazio(400)
+                return
+            if not itens:
+                self._send_vazio(400)
+                return
+            try:
+                ultimo = armazem.adicionar_lote(itens)
+            except OSError:
+                self._send_vazio(500)
+                return
+            self._send_json(202, {"status": "ok", "primeiro": ultimo - len(itens) + 1, "ultimo": ultimo,
+                                  "quantidade": len(itens), "tamanho": len(armazem)})
         else:
-            self.send_response(404)
-            self.end_headers()
+            self._send_vazio(404)
+
+
+# Com threads, um stream SSE ou long-poll aberto não trava os outros clientes
+class ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
 
 
-with socketserver.TCPServer(("", PORT), NossoHandler) as httpd:
+with ThreadingTCPServer(("", PORT), NossoHandler) as httpd:
     print("serving at port", PORT)
     httpd.serve_forever()
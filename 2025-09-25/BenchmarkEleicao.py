@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Conta mensagens e bytes por eleição para cada algoritmo do Servidor.py.
+
+Para cada tamanho de anel, sobe N nós em loopback com --algoritmo (via
+Cluster.py), zera os contadores (/estatisticas/zerar), dispara uma eleição
+no nó de menor id (pior caso do Bully) e soma os contadores de todos os
+nós quando o tráfego para.
+
+Exemplo: python BenchmarkEleicao.py --tamanhos 4 8 16 32 --derrubar-coordenador
+"""
+import argparse
+
+from Cluster import Cluster
+
+
+def medir(algoritmo: str, n: int, porta_base: int, derrubar_coordenador: bool) -> dict:
+    with Cluster(n, porta_base, algoritmo) as cluster:
+        cluster.esperar_quiescencia()
+        if derrubar_coordenador:
+            cluster.matar(n)
+        cluster.zerar()
+
+        cluster.post(1, "/eleicao/iniciar")
+        mensagens, bytes_ = cluster.esperar_quiescencia()
+
+        coordenadores = {r["coordenador"] for r in cluster.consultar_todos("/coordenador").values() if r}
+    return {"mensagens": mensagens, "bytes": bytes_, "coordenadores": coordenadores}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--algoritmos", nargs="+", default=["anel", "chang-roberts", "bully"])
+    parser.add_argument("--porta-base", type=int, default=9000)
+    parser.add_argument("--derrubar-coordenador", action="store_true",
+                        help="Mata o nó de maior id antes de disparar a eleição")
+    args = parser.parse_args()
+
+    print(f"{'algoritmo':<14} {'N':>4} {'mensagens':>10} {'bytes':>10} {'bytes/msg':>10} {'coordenador':>12}")
+    for n in args.tamanhos:
+        for algoritmo in args.algoritmos:
+            r = medir(algoritmo, n, args.porta_base, args.derrubar_coordenador)
+            coord = ",".join(str(c) for c in sorted(r["coordenadores"], key=str))
+            por_msg = r["bytes"] / r["mensagens"] if r["mensagens"] else 0
+            print(f"{algoritmo:<14} {n:>4} {r['mensagens']:>10} {r['bytes']:>10} {por_msg:>10.1f} {coord:>12}")
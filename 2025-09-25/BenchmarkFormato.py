@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Microbenchmark dos formatos de mensagem entre nós (Formato.py).
+
+Para cada tamanho de anel monta as mensagens de uma volta completa, sem
+subir nenhum nó:
+- anel: o token /eleicao cresce um id por salto e depois /coordenador dá a volta;
+- chang-roberts: um token /eleicao {"candidato"} por salto.
+
+Mede o custo de serializar e desserializar cada mensagem e os bytes por
+salto, só do corpo e com os cabeçalhos HTTP que o canal de saída envia.
+
+Exemplo: python BenchmarkFormato.py --tamanhos 3 10 50 200
+"""
+import argparse
+import time
+
+from Formato import FORMATOS, desserializar, serializar
+
+
+def mensagens_da_volta(algoritmo: str, n: int):
+    """(path, payload) de cada salto de uma eleição em um anel de n nós"""
+    if algoritmo == "chang-roberts":
+        return [("/eleicao", {"candidato": n, "epoca": 1})] * n
+    voltas = []
+    for k in range(1, n + 1):
+        ids = list(range(1, k + 1))
+        voltas.append(("/eleicao", {"iniciador": 1, "ids": ids, "participando": {str(i): True for i in ids},
+                                    "epoca": 1}))
+    voltas += [("/coordenador", {"coordenador": n, "origem": 1, "epoca": 1})] * (n - 1)
+    return voltas
+
+
+def cabecalho_http(path: str, tipo: str, tamanho: int) -> bytes:
+    # Mesmo cabeçalho que o CanalSaidaAsync escreve na conexão
+    return (f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1:8000\r\n"
+            f"Content-Type: {tipo}\r\nContent-Length: {tamanho}\r\n\r\n").encode("latin-1")
+
+
+def medir(formato: str, mensagens, repeticoes: int):
+    corpos = [serializar(payload, formato) for _, payload in mensagens]
+
+    t0 = time.perf_counter()
+    for _ in range(repeticoes):
+        for _, payload in mensagens:
+            serializar(payload, formato)
+    codificar = (time.perf_counter() - t0) / (repeticoes * len(mensagens))
+
+    t0 = time.perf_counter()
+    for _ in range(repeticoes):
+        for corpo, tipo in corpos:
+            desserializar(corpo, tipo)
+    decodificar = (time.perf_counter() - t0) / (repeticoes * len(mensagens))
+
+    corpo_total = sum(len(c) for c, _ in corpos)
+    com_cabecalho = corpo_total + sum(len(cabecalho_http(path, tipo, len(c)))
+                                      for (path, _), (c, tipo) in zip(mensagens, corpos))
+    return codificar, decodificar, corpo_total / len(mensagens), com_cabecalho / len(mensagens)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[3, 10, 50, 200])
+    parser.add_argument("--algoritmos", nargs="+", default=["anel", "chang-roberts"])
+    parser.add_argument("--formatos", nargs="+", default=FORMATOS, choices=FORMATOS)
+    parser.add_argument("--repeticoes", type=int, default=200, help="Voltas medidas por combinação")
+    args = parser.parse_args()
+
+    print(f"{'algoritmo':<14} {'nós':>5} {'formato':<9} {'cod (µs)':>9} {'dec (µs)':>9} "
+          f"{'corpo (B)':>10} {'c/ HTTP (B)':>12}")
+    for algoritmo in args.algoritmos:
+        for n in args.tamanhos:
+            mensagens = mensagens_da_volta(algoritmo, n)
+            for formato in args.formatos:
+                cod, dec, corpo, total = medir(formato, mensagens, max(1, args.repeticoes * 10 // n))
+                print(f"{algoritmo:<14} {n:>5} {formato:<9} {cod * 1e6:>9.2f} {dec * 1e6:>9.2f} "
+                      f"{corpo:>10.1f} {total:>12.1f}")
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Compara os runtimes threads e asyncio do Servidor.py em um anel local.
+
+Sobe um anel de 3 nós (portas 8000-8002) em loopback com cada runtime
+(via Cluster.py), dispara carga concorrente e mede requisições/s e
+latência p99.
+
+Exemplo: python BenchmarkRuntime.py --clientes 16 --duracao 5
+"""
+import argparse
+
+from Cluster import Cluster, gerar_carga, percentil
+
+PORTA_BASE = 8000
+
+# Cenários: (nome, método, nó alvo, path, corpo)
+# O POST /eleicao em um nó que não é o iniciador gera tráfego real no anel.
+CENARIOS = [
+    ("GET /coordenador", "GET", 1, "/coordenador", None),
+    ("POST /eleicao", "POST", 2, "/eleicao", {"iniciador": 1, "ids": [1], "participando": {"1": True}}),
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clientes", type=int, default=16, help="Clientes concorrentes")
+    parser.add_argument("--duracao", type=float, default=5.0, help="Segundos por cenário")
+    parser.add_argument("--runtimes", nargs="+", default=["threads", "asyncio"])
+    args = parser.parse_args()
+
+    print(f"{'runtime':<10} {'cenário':<20} {'req/s':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'erros':>6}")
+    for runtime in args.runtimes:
+        with Cluster(3, PORTA_BASE, opcoes=["--runtime", runtime]) as cluster:
+            cluster.esperar_coordenador(3)
+            for nome, metodo, no_id, path, corpo in CENARIOS:
+                latencias, erros = gerar_carga([cluster.url(no_id)], metodo, path, corpo,
+                                               args.clientes, args.duracao)
+                print(f"{runtime:<10} {nome:<20} {len(latencias) / args.duracao:>10.0f} "
+                      f"{percentil(latencias, 0.50) * 1000:>10.2f} "
+                      f"{percentil(latencias, 0.99) * 1000:>10.2f} {erros:>6}")
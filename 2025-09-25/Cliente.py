@@ -1,34 +1,40 @@
 #!/usr/bin/env python3
-import requests
-import json
 import argparse
+import json
+
+import requests
+
+from ClienteAnel import AnelIndisponivel, ClienteAnel
 
 parser = argparse.ArgumentParser()
-parser.add_argument("--server", type=str, required=True, help="URL do nó: ex http://127.0.0.1:8001")
+parser.add_argument("--server", type=str, nargs="+", required=True,
+                    help="URL do nó: ex http://127.0.0.1:8001 (outros nós depois servem de reserva)")
 args = parser.parse_args()
 
-SERVER = args.server.rstrip("/")
+cliente = ClienteAnel(args.server)
 
 def inserir_item(remetente:int, conteudo: str):
     dado = {"remetente": remetente, "conteudo": conteudo}
-    r = requests.post(f"{SERVER}/dados", json=dado, timeout=3)
+    r = cliente.inserir_item(dado)
     print("Resposta:", r.status_code, r.text)
 
+def inserir_varios(remetente: int, conteudos: list):
+    """Insere vários itens do mesmo remetente em lotes (POST /dados/batch)"""
+    itens = [{"remetente": remetente, "conteudo": c} for c in conteudos]
+    print("Itens inseridos:", cliente.inserir_itens(itens))
+
 def listar_itens():
-    r = requests.get(f"{SERVER}/dados", timeout=3)
-    print("Itens:", json.dumps(r.json(), ensure_ascii=False, indent=2))
+    print("Itens:", json.dumps(cliente.listar(), ensure_ascii=False, indent=2))
 
 def ver_coordenador():
-    r = requests.get(f"{SERVER}/coordenador", timeout=3)
-    print("Coordenador:", r.json())
+    print("Coordenador:", cliente.coordenador())
 
 def start_election():
     """Inicia uma eleição a partir do nó conectado"""
-    print(f"Pedindo para o Nó em {SERVER} iniciar uma eleição...")
+    print(f"Pedindo para o Nó em {cliente.url} iniciar uma eleição...")
     try:
         iniciador_id = int(input("Qual nó deve iniciar a eleição? (ex: 1): "))
-        payload = {"iniciador": iniciador_id, "ids": [iniciador_id], "participando": {str(iniciador_id): True}}
-        r = requests.post(f"{SERVER}/eleicao", json=payload, timeout=3)
+        r = cliente.iniciar_eleicao(iniciador_id)
         print("Resposta do início da eleição:", r.status_code, r.text)
     except Exception as e:
         print(f"Erro ao iniciar eleição: {e}")
@@ -36,15 +42,35 @@ def start_election():
 if __name__ == "__main__":
     while True:
         print("\nOpções:")
+        print("  1: Inserir item")
+        print("  2: Listar itens")
         print("  3: Ver coordenador atual")
         print("  4: Iniciar uma nova eleição")
+        print("  5: Inserir vários itens")
         print("  0: Sair")
         op = input("> ").strip()
-        if op == "3":
-            ver_coordenador()
-        elif op == "4":
-            start_election()
-        elif op == "0":
-            break
-        else:
-            print("opção inválida")
+        try:
+            if op in ("1", "5"):
+                try:
+                    remetente = int(input("ID do remetente: "))
+                except ValueError:
+                    print("ID inválido")
+                    continue
+                if op == "1":
+                    inserir_item(remetente, input("Conteúdo: "))
+                else:
+                    print("Um conteúdo por linha, linha vazia termina:")
+                    conteudos = list(iter(input, ""))
+                    inserir_varios(remetente, conteudos)
+            elif op == "2":
+                listar_itens()
+            elif op == "3":
+                ver_coordenador()
+            elif op == "4":
+                start_election()
+            elif op == "0":
+                break
+            else:
+                print("opção inválida")
+        except (AnelIndisponivel, requests.RequestException) as e:
+            print("Erro ao falar com o anel:", e)
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""Cliente compartilhado de /dados para os nós do anel (Servidor.py) e para o
+node.py de 2025-08-28.
+
+- ClienteAnel: uma requests.Session por thread, com pool de conexões
+  keep-alive por nó;
+- ClienteAnelAsync: o mesmo contrato em asyncio, com conexões HTTP/1.1
+  persistentes (asyncio.open_connection), sem dependências novas.
+
+Os dois recebem a lista de nós e tentam o próximo da lista quando um nó não
+responde ou devolve 5xx (ex.: 503 sem coordenador); depois de passar por
+todos, esperam com backoff exponencial antes da próxima volta. Um POST
+repetido depois de um timeout pode gravar o item duas vezes.
+
+inserir_itens manda vários itens por POST /dados/batch (uma lista JSON);
+nós sem essa rota (404) recebem um POST /dados por item.
+
+Também é um CLI de carga em massa:
+Exemplo: python ClienteAnel.py --nos http://127.0.0.1:9001 http://127.0.0.1:9002 \\
+             --total 200000 --lote 500 --conexoes 8 [--async]
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import random
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+TIMEOUT = 5.0
+# Voltas pela lista de nós antes de desistir (o backoff soma ~3 s, o bastante
+# para o anel eleger outro coordenador)
+TENTATIVAS = 6
+# Backoff entre voltas: 0.1, 0.2, 0.4 ... s (com jitter), no máximo ESPERA_MAXIMA
+ESPERA_INICIAL = 0.1
+ESPERA_MAXIMA = 2.0
+# Itens por POST /dados/batch
+TAMANHO_LOTE = 500
+# Status que valem uma nova tentativa em outro nó
+STATUS_REPETIR = {500, 502, 503, 504}
+
+
+class AnelIndisponivel(RuntimeError):
+    """Nenhum nó respondeu depois de todas as tentativas"""
+
+
+def espera_backoff(volta: int) -> float:
+    return min(ESPERA_MAXIMA, ESPERA_INICIAL * 2 ** volta) * random.uniform(0.5, 1.0)
+
+
+def _lista_nos(nos: Union[str, Sequence[str]]) -> List[str]:
+    nos = [nos] if isinstance(nos, str) else list(nos)
+    if not nos:
+        raise ValueError("informe pelo menos um nó")
+    return [url.rstrip("/") for url in nos]
+
+
+def _lotes(itens: Iterable, tamanho: int) -> Iterator[list]:
+    lote = []
+    for item in itens:
+        lote.append(item)
+        if len(lote) == tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+# -------- Cliente com threads (requests) --------
+class ClienteAnel:
+    """Cliente de /dados com keep-alive, lotes e failover entre nós.
+
+    Pode ser usado por várias threads ao mesmo tempo: cada uma recebe a
+    sua Session (e o seu pool de conexões), criada no primeiro uso.
+    """
+
+    def __init__(self, nos: Union[str, Sequence[str]], tentativas: int = TENTATIVAS,
+                 timeout: float = TIMEOUT, conexoes: int = 10):
+        self.nos = _lista_nos(nos)
+        self.tentativas = tentativas
+        self.timeout = timeout
+        self.conexoes = conexoes
+        self.atual = 0  # índice do último nó que respondeu
+        self.lote_suportado = True  # vira False se o nó não tem /dados/batch
+        self._local = threading.local()
+        self._sessoes: List[requests.Session] = []
+        self._lock = threading.Lock()
+
+    @property
+    def sessao(self) -> requests.Session:
+        sessao = getattr(self._local, "sessao", None)
+        if sessao is None:
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=len(self.nos), pool_maxsize=self.conexoes)
+            sessao.mount("http://", adaptador)
+            sessao.mount("https://", adaptador)
+            self._local.sessao = sessao
+            with self._lock:
+                self._sessoes.append(sessao)
+        return sessao
+
+    def _descartar_sessao(self):
+        """Fecha as conexões desta thread. Um nó que responde 404 sem ler o
+        corpo deixa o resto dele na conexão, que não pode ser reaproveitada."""
+        sessao = getattr(self._local, "sessao", None)
+        if sessao is not None:
+            sessao.close()
+            self._local.sessao = None
+            with self._lock:
+                self._sessoes.remove(sessao)
+
+    @property
+    def url(self) -> str:
+        """Nó em uso no momento"""
+        return self.nos[self.atual]
+
+    def requisitar(self, metodo: str, path: str, **kwargs) -> requests.Response:
+        """Faz a requisição no nó atual; em erro de conexão ou 5xx tenta o
+        próximo nó, com backoff a cada volta completa pela lista"""
+        kwargs.setdefault("timeout", self.timeout)
+        inicio = self.atual
+        erro: Optional[str] = None
+        for tentativa in range(self.tentativas * len(self.nos)):
+            if tentativa and tentativa % len(self.nos) == 0:
+                time.sleep(espera_backoff(tentativa // len(self.nos) - 1))
+            indice = (inicio + tentativa) % len(self.nos)
+            try:
+                resp = self.sessao.request(metodo, f"{self.nos[indice]}{path}", **kwargs)
+            except requests.exceptions.RequestException as e:
+                erro = f"{self.nos[indice]}: {e}"
+                continue
+            if resp.status_code in STATUS_REPETIR:
+                erro = f"{self.nos[indice]}: {resp.status_code} {resp.text}"
+                resp.close()
+                continue
+            self.atual = indice
+            return resp
+        raise AnelIndisponivel(f"{metodo} {path} falhou em todos os nós ({erro})")
+
+    def inserir_item(self, dado: dict) -> requests.Response:
+        return self.requisitar("POST", "/dados", json=dado)
+
+    def inserir_itens(self, itens: Iterable[dict], tamanho_lote: int = TAMANHO_LOTE) -> int:
+        """Insere os itens em lotes de `tamanho_lote` por requisição; devolve
+        quantos foram aceitos. Levanta requests.HTTPError se um lote for recusado."""
+        inseridos = 0
+        for lote in _lotes(itens, tamanho_lote):
+            if self.lote_suportado:
+                resp = self.requisitar("POST", "/dados/batch", json=lote)
+                if resp.status_code != 404:
+                    resp.raise_for_status()
+                    inseridos += len(lote)
+                    continue
+                self.lote_suportado = False
+                self._descartar_sessao()
+            for dado in lote:
+                self.inserir_item(dado).raise_for_status()
+                inseridos += 1
+        return inseridos
+
+    def listar(self) -> list:
+        """Lista completa (GET /dados sem parâmetros)"""
+        resp = self.requisitar("GET", "/dados")
+        resp.raise_for_status()
+        return resp.json()
+
+    def ler(self, since: int = 0, nome: Optional[str] = None) -> Iterator[dict]:
+        """Itens {"seq", "dado"} com seq > since, página a página"""
+        params = {"since": since}
+        if nome is not None:
+            params["nome"] = nome
+        mais = True
+        while mais:
+            resp = self.requisitar("GET", "/dados", params=params)
+            resp.raise_for_status()
+            pagina = resp.json()
+            for item in pagina["itens"]:
+                params["since"] = item["seq"]
+                yield item
+            mais = pagina["mais"] and bool(pagina["itens"])
+
+    def ouvir(self, since: int = 0) -> Iterator[Tuple[int, dict]]:
+        """(seq, dado) de cada item novo recebido por Server-Sent Events
+        (GET /dados/stream). Termina com RequestException se a conexão cair;
+        quem chama reconecta a partir do último seq recebido.
+        chunk_size=1 porque o stream não tem tamanho: com blocos maiores o
+        requests seguraria as mensagens até juntar um bloco inteiro."""
+        with self.requisitar("GET", "/dados/stream", params={"since": since},
+                             headers={"Last-Event-ID": str(since)}, stream=True,
+                             timeout=(self.timeout, 60)) as resp:
+            resp.raise_for_status()
+            seq = since
+            for linha in resp.iter_lines(chunk_size=1, decode_unicode=True):
+                if linha.startswith("id: "):
+                    seq = int(linha[4:])
+                elif linha.startswith("data: "):
+                    yield seq, json.loads(linha[6:])
+
+    def coordenador(self) -> dict:
+        resp = self.requisitar("GET", "/coordenador")
+        resp.raise_for_status()
+        return resp.json()
+
+    def iniciar_eleicao(self, iniciador: int) -> requests.Response:
+        """Entrega ao nó um token de eleição (sem época) com `iniciador`"""
+        payload = {"iniciador": iniciador, "ids": [iniciador], "participando": {str(iniciador): True}}
+        return self.requisitar("POST", "/eleicao", json=payload)
+
+    def fechar(self):
+        with self._lock:
+            for sessao in self._sessoes:
+                sessao.close()
+            self._sessoes.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+# -------- Cliente asyncio --------
+class ClienteAnelAsync:
+    """Mesmo contrato do ClienteAnel em asyncio.
+
+    Cada nó tem uma pilha de conexões livres; no máximo `conexoes`
+    requisições ficam em andamento ao mesmo tempo. As respostas dos nós
+    sempre trazem Content-Length, então a conexão volta para a pilha depois
+    de ler o corpo. Os métodos devolvem (status, corpo JSON ou None).
+    """
+
+    def __init__(self, nos: Union[str, Sequence[str]], tentativas: int = TENTATIVAS,
+                 timeout: float = TIMEOUT, conexoes: int = 10):
+        self.nos = _lista_nos(nos)
+        self.tentativas = tentativas
+        self.timeout = timeout
+        self.atual = 0
+        self.lote_suportado = True
+        self.livres: Dict[str, List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]] = defaultdict(list)
+        self.limite = asyncio.Semaphore(conexoes)
+
+    async def _trocar(self, url: str, metodo: str, path: str, corpo: Optional[bytes],
+                      conexao) -> Tuple[int, bytes, bool]:
+        reader, writer = conexao
+        alvo = urllib.parse.urlsplit(url)
+        cabecalho = f"{metodo} {path} HTTP/1.1\r\nHost: {alvo.netloc}\r\n"
+        if corpo is not None:
+            cabecalho += f"Content-Type: application/json; charset=utf-8\r\nContent-Length: {len(corpo)}\r\n"
+        writer.write(cabecalho.encode("latin-1") + b"\r\n" + (corpo or b""))
+        await writer.drain()
+
+        linha = await reader.readline()
+        if not linha:
+            raise ConnectionResetError("conexão fechada pelo nó")
+        status = int(linha.split(b" ", 2)[1])
+        headers = {}
+        while True:
+            linha = await reader.readline()
+            if linha in (b"\r\n", b"\n", b""):
+                break
+            nome, _, valor = linha.decode("latin-1").partition(":")
+            headers[nome.strip().lower()] = valor.strip()
+        tamanho = int(headers.get("content-length", 0))
+        dados = await reader.readexactly(tamanho) if tamanho else b""
+        return status, dados, headers.get("connection", "").lower() != "close"
+
+    async def _enviar(self, url: str, metodo: str, path: str, corpo: Optional[bytes]) -> Tuple[int, bytes]:
+        async with self.limite:
+            # Uma conexão parada na pilha pode ter sido fechada pelo nó: nesse
+            # caso a requisição é refeita uma vez em uma conexão nova
+            while self.livres[url]:
+                conexao = self.livres[url].pop()
+                try:
+                    status, dados, manter = await asyncio.wait_for(
+                        self._trocar(url, metodo, path, corpo, conexao), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    conexao[1].close()
+                    break
+                except BaseException:
+                    conexao[1].close()
+                    raise
+                self._devolver(url, conexao, manter)
+                return status, dados
+
+            alvo = urllib.parse.urlsplit(url)
+            conexao = await asyncio.wait_for(asyncio.open_connection(alvo.hostname, alvo.port or 80), self.timeout)
+            try:
+                status, dados, manter = await asyncio.wait_for(
+                    self._trocar(url, metodo, path, corpo, conexao), self.timeout)
+            except BaseException:
+                conexao[1].close()
+                raise
+            self._devolver(url, conexao, manter)
+            return status, dados
+
+    def _devolver(self, url: str, conexao, manter: bool):
+        if manter:
+            self.livres[url].append(conexao)
+        else:
+            conexao[1].close()
+
+    async def requisitar(self, metodo: str, path: str, payload=None) -> Tuple[int, Optional[object]]:
+        """Mesma política de failover e backoff do ClienteAnel.requisitar"""
+        corpo = None if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        inicio = self.atual
+        erro: Optional[str] = None
+        for tentativa in range(self.tentativas * len(self.nos)):
+            if tentativa and tentativa % len(self.nos) == 0:
+                await asyncio.sleep(espera_backoff(tentativa // len(self.nos) - 1))
+            indice = (inicio + tentativa) % len(self.nos)
+            url = self.nos[indice]
+            try:
+                status, dados = await self._enviar(url, metodo, path, corpo)
+            except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                erro = f"{url}: {e!r}"
+                continue
+            if status in STATUS_REPETIR:
+                erro = f"{url}: {status} {dados.decode('utf-8', 'replace')}"
+                continue
+            self.atual = indice
+            return status, json.loads(dados.decode("utf-8")) if dados else None
+        raise AnelIndisponivel(f"{metodo} {path} falhou em todos os nós ({erro})")
+
+    async def inserir_item(self, dado: dict) -> Tuple[int, Optional[object]]:
+        return await self.requisitar("POST", "/dados", dado)
+
+    async def inserir_lote(self, lote: List[dict]) -> int:
+        if self.lote_suportado:
+            status, resposta = await self.requisitar("POST", "/dados/batch", lote)
+            if status != 404:
+                if status >= 300:
+                    raise RuntimeError(f"lote recusado: {status} {resposta}")
+                return len(lote)
+            self.lote_suportado = False
+            # Como no ClienteAnel: a conexão que recebeu o 404 pode ter sobras do corpo
+            await self.fechar()
+        for dado in lote:
+            status, resposta = await self.inserir_item(dado)
+            if status >= 300:
+                raise RuntimeError(f"item recusado: {status} {resposta}")
+        return len(lote)
+
+    async def inserir_itens(self, itens: Iterable[dict], tamanho_lote: int = TAMANHO_LOTE) -> int:
+        """Insere os lotes em paralelo (até `conexoes` por vez); devolve
+        quantos itens foram aceitos"""
+        return sum(await asyncio.gather(*(self.inserir_lote(lote) for lote in _lotes(itens, tamanho_lote))))
+
+    async def listar(self) -> list:
+        _, lista = await self.requisitar("GET", "/dados")
+        return lista
+
+    async def ler(self, since: int = 0, nome: Optional[str] = None) -> List[dict]:
+        """Todos os itens {"seq", "dado"} com seq > since"""
+        itens: List[dict] = []
+        mais = True
+        while mais:
+            params = {"since": since} if nome is None else {"since": since, "nome": nome}
+            _, pagina = await self.requisitar("GET", f"/dados?{urllib.parse.urlencode(params)}")
+            itens += pagina["itens"]
+            if pagina["itens"]:
+                since = pagina["itens"][-1]["seq"]
+            mais = pagina["mais"] and bool(pagina["itens"])
+        return itens
+
+    async def coordenador(self) -> dict:
+        _, resposta = await self.requisitar("GET", "/coordenador")
+        return resposta
+
+    async def fechar(self):
+        for conexoes in self.livres.values():
+            for _, writer in conexoes:
+                writer.close()
+            conexoes.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.fechar()
+
+
+# -------- Carga em massa --------
+def itens_de_carga(inicio: int, fim: int) -> List[dict]:
+    # Mesmo formato do carga.py: "nome" alimenta o índice por remetente do node.py
+    return [{"nome": f"carga{i % 16}", "mensagem": f"mensagem {i}"} for i in range(inicio, fim)]
+
+
+def carregar(nos: List[str], total: int, lote: int, conexoes: int) -> Tuple[int, int]:
+    """Empurra `total` itens com `conexoes` threads; devolve (inseridos, erros)"""
+    cliente = ClienteAnel(nos, conexoes=conexoes)
+    inseridos = erros = 0
+
+    def enviar(inicio: int) -> Tuple[int, int]:
+        itens = itens_de_carga(inicio, min(inicio + lote, total))
+        try:
+            return cliente.inserir_itens(itens, lote), 0
+        except (AnelIndisponivel, requests.RequestException) as e:
+            print("[erro] Lote a partir de", inicio, "perdido:", e)
+            return 0, len(itens)
+
+    with cliente, concurrent.futures.ThreadPoolExecutor(conexoes) as executor:
+        for ok, falhas in executor.map(enviar, range(0, total, lote)):
+            inseridos += ok
+            erros += falhas
+    return inseridos, erros
+
+
+async def carregar_async(nos: List[str], total: int, lote: int, conexoes: int) -> Tuple[int, int]:
+    """Como carregar(), com `conexoes` tarefas em um event loop"""
+    inicios = iter(range(0, total, lote))
+    resultado = [0, 0]
+
+    async def trabalhador(cliente: ClienteAnelAsync):
+        for inicio in inicios:
+            itens = itens_de_carga(inicio, min(inicio + lote, total))
+            try:
+                inseridos = await cliente.inserir_lote(itens)
+            except (AnelIndisponivel, RuntimeError) as e:
+                print("[erro] Lote a partir de", inicio, "perdido:", e)
+                resultado[1] += len(itens)
+            else:
+                resultado[0] += inseridos
+
+    async with ClienteAnelAsync(nos, conexoes=conexoes) as cliente:
+        await asyncio.gather(*(trabalhador(cliente) for _ in range(conexoes)))
+    return resultado[0], resultado[1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nos", nargs="+", required=True, help="URLs dos nós, na ordem de preferência")
+    parser.add_argument("--total", type=int, default=100000, help="Itens a inserir")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="Itens por POST /dados/batch")
+    parser.add_argument("--conexoes", type=int, default=8, help="Lotes em andamento ao mesmo tempo")
+    parser.add_argument("--async", dest="usar_async", action="store_true",
+                        help="Usa o ClienteAnelAsync em vez de threads")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.usar_async:
+        inseridos, erros = asyncio.run(carregar_async(args.nos, args.total, args.lote, args.conexoes))
+    else:
+        inseridos, erros = carregar(args.nos, args.total, args.lote, args.conexoes)
+    duracao = time.perf_counter() - t0
+    print(f"{inseridos} itens em {duracao:.2f} s ({inseridos / duracao:.0f} itens/s), {erros} perdidos")
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""Sobe N nós do Servidor.py em loopback e mede o anel de ponta a ponta.
+
+A tabela de membros (nos.json) é gerada para cada cluster, então não é
+preciso casar ids e portas à mão com nos_conectados. Para cada tamanho e
+algoritmo o roteiro é:
+
+- eleicao: zera os contadores, dispara uma eleição no nó 1 e mede quanto
+  tempo até todos os nós registrarem o anúncio, com mensagens e bytes;
+- dados: carga de POST /dados espalhada entre os nós (req/s, p50, p99);
+- falha: mata o coordenador (o que os nós apontam, não o maior id) e mede
+  até os sobreviventes concordarem com o novo (detecção por heartbeat +
+  eleição + anúncio); coordenador dividido ou errado sai em "pós-falha";
+- concorrente (opcional): todos os nós iniciam uma eleição ao mesmo tempo
+  e conta as mensagens até o tráfego parar.
+
+Também serve para testes manuais: --manter sobe o cluster e espera Ctrl+C.
+
+Exemplo: python Cluster.py --tamanhos 3 10 50 --algoritmos anel bully
+         python Cluster.py --tamanhos 5 --manter --opcoes-no "--runtime asyncio"
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SERVIDOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Servidor.py")
+
+
+def esperar_porta(porta: int, timeout: float = 10.0):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            with socket.create_connection(("127.0.0.1", porta), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Nó na porta {porta} não subiu")
+
+
+def percentil(valores, p: float) -> float:
+    if not valores:
+        return float("nan")
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def gerar_carga(urls: List[str], metodo: str, path: str, corpo, clientes: int, duracao: float):
+    """Cada cliente usa sua própria sessão keep-alive com um nó (em rodízio);
+    devolve (latências em s, erros)"""
+    latencias = []
+    erros = [0]
+    lock = threading.Lock()
+    fim = time.perf_counter() + duracao
+
+    def cliente(n):
+        url = f"{urls[n % len(urls)]}{path}"
+        sessao = requests.Session()
+        locais = []
+        falhas = 0
+        while time.perf_counter() < fim:
+            t0 = time.perf_counter()
+            try:
+                if metodo == "GET":
+                    r = sessao.get(url, timeout=5)
+                else:
+                    r = sessao.post(url, json=corpo, timeout=5)
+                if r.status_code < 400:
+                    locais.append(time.perf_counter() - t0)
+                else:
+                    falhas += 1
+            except requests.RequestException:
+                falhas += 1
+        with lock:
+            latencias.extend(locais)
+            erros[0] += falhas
+
+    threads = [threading.Thread(target=cliente, args=(n,)) for n in range(clientes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencias, erros[0]
+
+
+class Cluster:
+    """N processos do Servidor.py com ids 1..N nas portas porta_base..porta_base+N-1"""
+
+    def __init__(self, n: int, porta_base: int = 9000, algoritmo: str = "anel",
+                 opcoes: Optional[List[str]] = None, pasta_logs: Optional[str] = None):
+        self.nos = {str(i): f"http://127.0.0.1:{porta_base + i - 1}" for i in range(1, n + 1)}
+        self.algoritmo = algoritmo
+        self.opcoes = list(opcoes or [])
+        self.pasta_logs = pasta_logs
+        self.processos: Dict[int, subprocess.Popen] = {}
+        self.temporaria = tempfile.TemporaryDirectory()
+        self.pasta = self.temporaria.name
+        self.sessao = requests.Session()
+        self.sessao.mount("http://", HTTPAdapter(pool_maxsize=32))
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=32)
+
+    def __enter__(self):
+        self.subir()
+        return self
+
+    def __exit__(self, *_):
+        self.derrubar()
+
+    # ---- processos ----
+    def porta(self, no_id: int) -> int:
+        return int(self.nos[str(no_id)].rsplit(":", 1)[1])
+
+    def _iniciar(self, no_id: int):
+        saida = subprocess.DEVNULL
+        if self.pasta_logs:
+            saida = open(os.path.join(self.pasta_logs, f"no{no_id}.log"), "a", encoding="utf-8")
+        self.processos[no_id] = subprocess.Popen(
+            [sys.executable, SERVIDOR, str(no_id), str(self.porta(no_id)), "--nos",
+             os.path.join(self.pasta, "nos.json"), "--algoritmo", self.algoritmo, *self.opcoes],
+            cwd=self.pasta, stdout=saida, stderr=subprocess.STDOUT,
+        )
+        if saida is not subprocess.DEVNULL:
+            saida.close()  # o processo filho já herdou o descritor
+
+    def subir(self, timeout: float = 60.0):
+        """Gera o nos.json e sobe todos os nós; o nó 1 sobe por último porque
+        inicia a eleição assim que começa"""
+        with open(os.path.join(self.pasta, "nos.json"), "w", encoding="utf-8") as f:
+            json.dump(self.nos, f)
+        outros = [int(i) for i in self.nos if i != "1"]
+        for no_id in outros:
+            self._iniciar(no_id)
+        for no_id in outros:
+            esperar_porta(self.porta(no_id), timeout)
+        self._iniciar(1)
+        esperar_porta(self.porta(1), timeout)
+
+    def matar(self, no_id: int):
+        """Falha abrupta (SIGKILL): o nó não avisa ninguém que saiu"""
+        p = self.processos.pop(no_id)
+        p.kill()
+        p.wait()
+
+    def reiniciar(self, no_id: int):
+        """Sobe de novo um nó morto; ele retoma o estado salvo e reentra no anel"""
+        self._iniciar(no_id)
+        esperar_porta(self.porta(no_id))
+
+    def derrubar(self):
+        for p in self.processos.values():
+            p.terminate()
+        for p in self.processos.values():
+            p.wait()
+        self.processos.clear()
+        self.executor.shutdown()
+        self.temporaria.cleanup()
+
+    def vivos(self) -> List[int]:
+        return sorted(self.processos)
+
+    # ---- consultas ----
+    def url(self, no_id: int) -> str:
+        return self.nos[str(no_id)]
+
+    def get(self, no_id: int, path: str, timeout: float = 2.0):
+        return self.sessao.get(f"{self.url(no_id)}{path}", timeout=timeout).json()
+
+    def post(self, no_id: int, path: str, payload: Optional[dict] = None, timeout: float = 2.0):
+        return self.sessao.post(f"{self.url(no_id)}{path}", json=payload or {}, timeout=timeout)
+
+    def consultar_todos(self, path: str) -> Dict[int, Optional[dict]]:
+        """GET em paralelo em todos os nós vivos (None para quem não respondeu)"""
+        def consultar(no_id):
+            try:
+                return self.get(no_id, path)
+            except (requests.RequestException, ValueError):
+                return None
+        ids = self.vivos()
+        return dict(zip(ids, self.executor.map(consultar, ids)))
+
+    def zerar(self):
+        list(self.executor.map(lambda i: self.post(i, "/estatisticas/zerar"), self.vivos()))
+
+    def total_enviado(self) -> Tuple[int, int]:
+        mensagens = bytes_ = 0
+        for est in self.consultar_todos("/estatisticas").values():
+            if est:
+                mensagens += sum(est["mensagens"].values())
+                bytes_ += sum(est["bytes"].values())
+        return mensagens, bytes_
+
+    def esperar_quiescencia(self, intervalo: float = 0.3, estavel: int = 3, timeout: float = 60.0) -> Tuple[int, int]:
+        """Espera os contadores pararem de mudar por `estavel` leituras seguidas"""
+        ultimo, iguais = None, 0
+        limite = time.time() + timeout
+        while time.time() < limite and iguais < estavel:
+            time.sleep(intervalo)
+            atual = self.total_enviado()
+            iguais = iguais + 1 if atual == ultimo else 0
+            ultimo = atual
+        return ultimo
+
+    def esperar_coordenador(self, esperado: int, timeout: float = 60.0) -> float:
+        """Segundos até todos os vivos apontarem `esperado` como coordenador"""
+        inicio = time.perf_counter()
+        while time.perf_counter() - inicio < timeout:
+            respostas = self.consultar_todos("/coordenador").values()
+            if all(r is not None and r["coordenador"] == esperado for r in respostas):
+                return time.perf_counter() - inicio
+            time.sleep(0.02)
+        raise TimeoutError(f"nós não concordaram com o coordenador {esperado} em {timeout}s")
+
+    def coordenadores(self) -> Set[Optional[int]]:
+        """Coordenadores apontados pelos vivos (None: não respondeu ou não sabe)"""
+        return {r["coordenador"] if r else None for r in self.consultar_todos("/coordenador").values()}
+
+    def esperar_acordo(self, timeout: float = 60.0) -> Tuple[float, int]:
+        """(segundos, coordenador) até todos os vivos apontarem o mesmo nó vivo,
+        seja ele qual for"""
+        inicio = time.perf_counter()
+        while time.perf_counter() - inicio < timeout:
+            coordenadores = self.coordenadores()
+            if len(coordenadores) == 1 and next(iter(coordenadores)) in self.processos:
+                return time.perf_counter() - inicio, coordenadores.pop()
+            time.sleep(0.02)
+        raise TimeoutError(f"sem acordo em {timeout}s: {sorted(coordenadores, key=str)}")
+
+    def esperar_eleicoes(self, minimo: int = 1, timeout: float = 60.0) -> float:
+        """Segundos até todos os vivos terem registrado `minimo` eleições
+        concluídas no /metrics (histograma tempo_eleicao)"""
+        inicio = time.perf_counter()
+        while time.perf_counter() - inicio < timeout:
+            concluidas = [sum(h["total"] for h in m["histogramas"].get("tempo_eleicao", {}).values()) if m else 0
+                          for m in self.consultar_todos("/metrics").values()]
+            if min(concluidas) >= minimo:
+                return time.perf_counter() - inicio
+            time.sleep(0.02)
+        raise TimeoutError(f"eleição não terminou em todos os nós em {timeout}s")
+
+    def tempos_eleicao(self) -> List[float]:
+        """Tempo de eleição visto por cada nó (média do histograma do /metrics)"""
+        tempos = []
+        for m in self.consultar_todos("/metrics").values():
+            for h in (m or {}).get("histogramas", {}).get("tempo_eleicao", {}).values():
+                tempos.append(h["media"])
+        return tempos
+
+
+# -------- Cenários --------
+def cenario_eleicao(cluster: Cluster) -> dict:
+    cluster.esperar_quiescencia()
+    cluster.zerar()
+    cluster.post(1, "/eleicao/iniciar")
+    convergencia = cluster.esperar_eleicoes()
+    mensagens, bytes_ = cluster.esperar_quiescencia()
+    tempos = cluster.tempos_eleicao()
+    coordenadores = {r["coordenador"] for r in cluster.consultar_todos("/coordenador").values() if r}
+    return {"eleicao_ms": convergencia * 1000, "no_max_ms": max(tempos, default=0) * 1000,
+            "mensagens": mensagens, "bytes": bytes_, "coordenadores": coordenadores}
+
+
+def cenario_dados(cluster: Cluster, clientes: int, duracao: float) -> dict:
+    urls = [cluster.url(i) for i in cluster.vivos()]
+    latencias, erros = gerar_carga(urls, "POST", "/dados", {"remetente": 0, "conteudo": "carga"}, clientes, duracao)
+    return {"req_s": len(latencias) / duracao, "p50_ms": percentil(latencias, 0.50) * 1000,
+            "p99_ms": percentil(latencias, 0.99) * 1000, "erros": erros}
+
+
+def cenario_concorrente(cluster: Cluster) -> dict:
+    cluster.esperar_quiescencia()
+    cluster.zerar()
+    list(cluster.executor.map(lambda i: cluster.post(i, "/eleicao/iniciar"), cluster.vivos()))
+    mensagens, bytes_ = cluster.esperar_quiescencia()
+    return {"concorrente_msgs": mensagens}
+
+
+def cenario_falha(cluster: Cluster) -> dict:
+    """Mata o coordenador de fato (lido do /coordenador) e cronometra o acordo
+    em outro nó. Coordenador dividido ou que não é o maior vivo, antes ou
+    depois, sai na coluna "pós-falha" no lugar do tempo."""
+    coordenadores = cluster.coordenadores()
+    if len(coordenadores) != 1 or None in coordenadores:
+        return {"recuperacao_ms": float("nan"), "pos_falha": "dividido"}
+    coordenador = coordenadores.pop()
+    if coordenador != max(cluster.vivos()):
+        return {"recuperacao_ms": float("nan"), "pos_falha": f"antes {coordenador}"}
+    cluster.matar(coordenador)
+    try:
+        segundos, novo = cluster.esperar_acordo()
+    except TimeoutError:
+        return {"recuperacao_ms": float("nan"), "pos_falha": "dividido"}
+    if novo != max(cluster.vivos()):
+        return {"recuperacao_ms": float("nan"), "pos_falha": f"errado {novo}"}
+    return {"recuperacao_ms": segundos * 1000, "pos_falha": str(novo)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[3, 10, 50])
+    parser.add_argument("--algoritmos", nargs="+", default=["anel", "chang-roberts", "bully"])
+    parser.add_argument("--cenarios", nargs="+", default=["eleicao", "dados", "falha"],
+                        choices=["eleicao", "dados", "falha", "concorrente"])
+    parser.add_argument("--porta-base", type=int, default=9000)
+    parser.add_argument("--clientes", type=int, default=8, help="Clientes concorrentes no cenário dados")
+    parser.add_argument("--duracao", type=float, default=3.0, help="Segundos de carga no cenário dados")
+    parser.add_argument("--opcoes-no", default="", help='Opções extras do Servidor.py, ex: "--runtime asyncio"')
+    parser.add_argument("--pasta-logs", help="Grava a saída de cada nó em PASTA/no{ID}.log")
+    parser.add_argument("--manter", action="store_true", help="Só sobe o cluster (primeiro tamanho/algoritmo) e espera Ctrl+C")
+    args = parser.parse_args()
+    opcoes = shlex.split(args.opcoes_no)
+
+    if args.manter:
+        with Cluster(args.tamanhos[0], args.porta_base, args.algoritmos[0], opcoes, args.pasta_logs) as cluster:
+            print(f"{len(cluster.nos)} nós no ar ({args.algoritmos[0]}):")
+            for no_id, url in cluster.nos.items():
+                print(f"  Nó {no_id}: {url}")
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                pass
+        sys.exit(0)
+
+    print(f"{'algoritmo':<14} {'N':>4} {'eleição (ms)':>13} {'nó máx (ms)':>12} {'msgs':>6} {'bytes':>8} {'coord':>6} "
+          f"{'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9} {'falha (ms)':>11} {'pós-falha':>10} {'concorr. msgs':>14}")
+    for n in args.tamanhos:
+        for algoritmo in args.algoritmos:
+            r = {}
+            with Cluster(n, args.porta_base, algoritmo, opcoes, args.pasta_logs) as cluster:
+                cluster.esperar_coordenador(n)
+                if "eleicao" in args.cenarios:
+                    r.update(cenario_eleicao(cluster))
+                if "dados" in args.cenarios:
+                    r.update(cenario_dados(cluster, args.clientes, args.duracao))
+                if "concorrente" in args.cenarios:
+                    r.update(cenario_concorrente(cluster))
+                if "falha" in args.cenarios:
+                    r.update(cenario_falha(cluster))
+            coord = ",".join(str(c) for c in sorted(r.get("coordenadores", []), key=str)) or "-"
+            print(f"{algoritmo:<14} {n:>4} {r.get('eleicao_ms', float('nan')):>13.1f} "
+                  f"{r.get('no_max_ms', float('nan')):>12.1f} {r.get('mensagens', 0):>6} "
+                  f"{r.get('bytes', 0):>8} {coord:>6} {r.get('req_s', float('nan')):>8.0f} "
+                  f"{r.get('p50_ms', float('nan')):>9.2f} {r.get('p99_ms', float('nan')):>9.2f} "
+                  f"{r.get('recuperacao_ms', float('nan')):>11.1f} {r.get('pos_falha', '-'):>10} "
+                  f"{r.get('concorrente_msgs', '-'):>14}")
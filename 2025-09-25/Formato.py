@@ -0,0 +1,105 @@
+"""Formatos de corpo das mensagens entre nós do anel (Servidor.py).
+
+JSON continua sendo o padrão e o que o Cliente.py fala. Os nós podem optar
+por um formato compacto para as mensagens de eleição e de coordenador, que
+são só alguns inteiros:
+
+- "compacto": layouts fixos com struct, identificados pelo primeiro byte;
+- "msgpack": precisa do pacote msgpack instalado.
+
+O formato vai no Content-Type. Quem recebe decodifica pelo Content-Type e
+responde 415 se não conhece o formato, e aí quem enviou volta para JSON.
+"""
+import json
+import struct
+from typing import Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:  # opcional
+    msgpack = None
+
+TIPO_JSON = "application/json; charset=utf-8"
+TIPO_COMPACTO = "application/x-anel-compacto"
+TIPO_MSGPACK = "application/msgpack"
+
+FORMATOS = ["json", "compacto"] + (["msgpack"] if msgpack is not None else [])
+
+# Layouts fixos (ordem de rede). O primeiro byte diz qual layout segue e o
+# campo seguinte é sempre a época da eleição.
+ELEICAO_ANEL = 1  # época, iniciador, quantidade de ids, ids...
+ELEICAO_CANDIDATO = 2  # época, candidato (Chang-Roberts)
+COORDENADOR = 3  # época, coordenador, origem, difusão
+_ELEICAO_ANEL = struct.Struct("!BIIH")
+_ELEICAO_CANDIDATO = struct.Struct("!BII")
+_COORDENADOR = struct.Struct("!BIIIB")
+
+
+class FormatoNaoSuportado(ValueError):
+    """Content-Type que este nó não sabe decodificar (vira 415)"""
+
+
+def _compactar(payload: dict) -> Optional[bytes]:
+    """Layout fixo da mensagem, ou None se ela não se encaixa em nenhum"""
+    chaves = set(payload)
+    try:
+        if chaves == {"iniciador", "ids", "participando", "epoca"}:
+            ids = [int(i) for i in payload["ids"]]
+            # No anel todo id da lista está participando; o mapa é refeito na leitura
+            if payload["participando"] != {str(i): True for i in ids}:
+                return None
+            return (_ELEICAO_ANEL.pack(ELEICAO_ANEL, int(payload["epoca"]), int(payload["iniciador"]), len(ids))
+                    + struct.pack(f"!{len(ids)}I", *ids))
+        if chaves == {"candidato", "epoca"}:
+            return _ELEICAO_CANDIDATO.pack(ELEICAO_CANDIDATO, int(payload["epoca"]), int(payload["candidato"]))
+        if chaves in ({"coordenador", "origem", "epoca"}, {"coordenador", "origem", "epoca", "difusao"}):
+            return _COORDENADOR.pack(COORDENADOR, int(payload["epoca"]), int(payload["coordenador"]),
+                                     int(payload["origem"]), bool(payload.get("difusao")))
+    except (struct.error, TypeError, ValueError):
+        pass
+    return None
+
+
+def _descompactar(corpo: bytes) -> dict:
+    try:
+        tipo = corpo[0]
+        if tipo == ELEICAO_ANEL:
+            _, epoca, iniciador, n = _ELEICAO_ANEL.unpack_from(corpo)
+            ids = list(struct.unpack_from(f"!{n}I", corpo, _ELEICAO_ANEL.size))
+            return {"iniciador": iniciador, "ids": ids, "participando": {str(i): True for i in ids}, "epoca": epoca}
+        if tipo == ELEICAO_CANDIDATO:
+            _, epoca, candidato = _ELEICAO_CANDIDATO.unpack(corpo)
+            return {"candidato": candidato, "epoca": epoca}
+        if tipo == COORDENADOR:
+            _, epoca, coordenador, origem, difusao = _COORDENADOR.unpack(corpo)
+            payload = {"coordenador": coordenador, "origem": origem, "epoca": epoca}
+            if difusao:
+                payload["difusao"] = True
+            return payload
+    except (IndexError, struct.error) as e:
+        raise ValueError(f"corpo compacto inválido: {e}")
+    raise ValueError(f"layout compacto desconhecido: {tipo}")
+
+
+def serializar(payload: dict, formato: str = "json") -> Tuple[bytes, str]:
+    """Devolve (corpo, Content-Type). Mensagens que o formato pedido não
+    representa saem em JSON."""
+    if formato == "compacto":
+        corpo = _compactar(payload)
+        if corpo is not None:
+            return corpo, TIPO_COMPACTO
+    elif formato == "msgpack" and msgpack is not None:
+        return msgpack.packb(payload), TIPO_MSGPACK
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8"), TIPO_JSON
+
+
+def desserializar(corpo: bytes, content_type: Optional[str]) -> dict:
+    """Decodifica pelo Content-Type (sem Content-Type, assume JSON)"""
+    tipo = (content_type or "application/json").split(";")[0].strip().lower()
+    if tipo == "application/json":
+        return json.loads(corpo.decode("utf-8")) if corpo else {}
+    if tipo == TIPO_COMPACTO:
+        return _descompactar(corpo)
+    if tipo == TIPO_MSGPACK and msgpack is not None:
+        return msgpack.unpackb(corpo) if corpo else {}
+    raise FormatoNaoSuportado(tipo)
@@ -0,0 +1,128 @@
+"""Detecção de falha do coordenador por heartbeats UDP (Servidor.py).
+
+O coordenador manda um datagrama de 8 bytes para cada membro a cada
+`intervalo` segundos. Os demais alimentam um detector phi-accrual com os
+intervalos de chegada; quando o phi passa do limiar, o coordenador é
+considerado suspeito e o callback `ao_suspeitar` dispara a eleição.
+
+O socket UDP usa o mesmo número de porta do servidor HTTP do nó.
+"""
+import math
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
+MAGICO = b"ANHB"
+FORMATO = "!4sI"  # mágico + id do coordenador que enviou
+
+
+class DetectorPhi:
+    """Phi-accrual (Hayashibara et al.): quanto maior o phi, menos provável
+    que o próximo heartbeat ainda chegue. Phi 8 ~ 1 chance em 10^8 de
+    suspeita falsa segundo a distribuição observada."""
+
+    def __init__(self, intervalo_esperado: float, janela: int = 100):
+        self.intervalo_esperado = intervalo_esperado
+        self.desvio_minimo = intervalo_esperado / 10
+        self.intervalos: deque = deque(maxlen=janela)
+        self.ultimo: Optional[float] = None
+
+    def reiniciar(self, agora: float):
+        # Começa com uma amostra "esperada" para não suspeitar sem histórico
+        self.intervalos.clear()
+        self.intervalos.append(self.intervalo_esperado)
+        self.ultimo = agora
+
+    def batida(self, agora: float):
+        if self.ultimo is not None:
+            self.intervalos.append(agora - self.ultimo)
+        self.ultimo = agora
+
+    def phi(self, agora: float) -> float:
+        if self.ultimo is None or not self.intervalos:
+            return 0.0
+        n = len(self.intervalos)
+        media = sum(self.intervalos) / n
+        variancia = sum((x - media) ** 2 for x in self.intervalos) / n
+        desvio = max(math.sqrt(variancia), self.desvio_minimo)
+        # Aproximação logística da normal acumulada, como no Akka/Cassandra
+        y = (agora - self.ultimo - media) / desvio
+        e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        if agora - self.ultimo > media:
+            return -math.log10(e / (1.0 + e))
+        return -math.log10(1.0 - 1.0 / (1.0 + e))
+
+
+class MonitorHeartbeat:
+    """Envia heartbeats quando este nó é o coordenador e vigia o coordenador
+    atual quando não é. As funções recebidas consultam o estado do nó."""
+
+    def __init__(self, no_id: int, porta: int, intervalo: float, limiar: float,
+                 destinos: Callable[[], List[Tuple[str, int]]],
+                 coordenador: Callable[[], Optional[int]],
+                 ao_suspeitar: Callable[[int], None]):
+        self.no_id = no_id
+        self.porta = porta
+        self.intervalo = intervalo
+        self.limiar = limiar
+        self.destinos = destinos
+        self.coordenador = coordenador
+        self.ao_suspeitar = ao_suspeitar
+        self.detector = DetectorPhi(intervalo)
+        self.lock = threading.Lock()
+        self.vigiado: Optional[int] = None
+        self.suspeito = False
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def iniciar(self):
+        self.sock.bind(("", self.porta))
+        for alvo in (self._enviar, self._receber, self._vigiar):
+            threading.Thread(target=alvo, daemon=True).start()
+
+    def _enviar(self):
+        pacote = struct.pack(FORMATO, MAGICO, self.no_id)
+        while True:
+            if self.coordenador() == self.no_id:
+                for destino in self.destinos():
+                    try:
+                        self.sock.sendto(pacote, destino)
+                    except OSError:
+                        pass
+            time.sleep(self.intervalo)
+
+    def _receber(self):
+        tamanho = struct.calcsize(FORMATO)
+        while True:
+            dados, _ = self.sock.recvfrom(64)
+            if len(dados) != tamanho:
+                continue
+            magico, remetente = struct.unpack(FORMATO, dados)
+            if magico != MAGICO or remetente != self.coordenador():
+                continue
+            with self.lock:
+                if remetente == self.vigiado:
+                    self.detector.batida(time.monotonic())
+                    self.suspeito = False
+
+    def _vigiar(self):
+        while True:
+            time.sleep(self.intervalo / 2)
+            coord = self.coordenador()
+            agora = time.monotonic()
+            with self.lock:
+                if coord is None or coord == self.no_id:
+                    self.vigiado = None
+                    continue
+                if coord != self.vigiado:
+                    # Coordenador novo: histórico anterior não vale para ele
+                    self.vigiado = coord
+                    self.suspeito = False
+                    self.detector.reiniciar(agora)
+                    continue
+                if self.suspeito or self.detector.phi(agora) < self.limiar:
+                    continue
+                self.suspeito = True
+            self.ao_suspeitar(coord)
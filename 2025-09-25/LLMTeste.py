@@ -1,7 +1,14 @@
-import pandas as pd
+import argparse
+import bisect
+import collections
+import csv
+import json
+import math
+import multiprocessing
+import os
 import random
-import itertools
 import re
+import unicodedata
 
 # ==============================================================================
 # 1. FILTRO DE SEGURANÇA
@@ -15,14 +22,46 @@ PALAVRAS_FILTRADAS = [
     "palavrao1", "palavrao2", "qualqueroutrapalavra"
 ]
 
-def contem_palavra_impropria(texto):
-    """Verifica se o texto contém alguma palavra da lista de filtragem."""
-    # Cria uma expressão regular que encontra palavras inteiras, ignorando maiúsculas/minúsculas
-    # O \b garante que estamos pegando a palavra inteira (ex: 'mar' e não 'amar')
-    for palavra in PALAVRAS_FILTRADAS:
-        if re.search(r'\b' + re.escape(palavra) + r'\b', texto, re.IGNORECASE):
-            return True
-    return False
+def normalizar(texto):
+    """Minúsculas e sem acentos, para 'Palavrão' e 'palavrao' serem a mesma palavra."""
+    texto = unicodedata.normalize("NFKD", texto.casefold())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+class FiltroPalavras:
+    """Filtro montado uma vez: todas as palavras viram uma única expressão
+    regular (uma alternância), então cada texto é percorrido uma só vez,
+    qualquer que seja o tamanho da lista."""
+
+    def __init__(self, palavras):
+        # Palavras mais longas primeiro, para a alternância preferir o termo inteiro
+        termos = sorted({normalizar(p) for p in palavras if p.strip()}, key=len, reverse=True)
+        # O \b garante que estamos pegando a palavra inteira (ex: 'mar' e não 'amar')
+        self.regex = re.compile(r'\b(?:' + '|'.join(map(re.escape, termos)) + r')\b') if termos else None
+
+    def contem(self, texto):
+        """Verifica se o texto contém alguma palavra da lista de filtragem."""
+        return self.regex is not None and self.regex.search(normalizar(texto)) is not None
+
+    def contem_em_lote(self, textos):
+        """Versão para uma coluna inteira (lista, Series...): junta os textos
+        e faz uma só busca, devolvendo um bool por texto."""
+        textos = [normalizar(t) for t in textos]
+        marcados = [False] * len(textos)
+        if self.regex is None:
+            return marcados
+        inicios = []
+        pos = 0
+        for t in textos:
+            inicios.append(pos)
+            pos += len(t) + 1  # o "\n" separa os textos e é fronteira de palavra
+        for m in self.regex.finditer("\n".join(textos)):
+            marcados[bisect.bisect_right(inicios, m.start()) - 1] = True
+        return marcados
+
+
+FILTRO = FiltroPalavras(PALAVRAS_FILTRADAS)
+
 
 # ==============================================================================
 # 2. BLOCOS DE CONSTRUÇÃO (COMPONENTES)
@@ -55,73 +94,262 @@ respostas_rotina_positiva = ["Isso é muito importante para ficarmos saudáveis
 # 3. MOTOR DE GERAÇÃO MASSIVA E FILTRADA
 # ==============================================================================
 
-def gerar_dataset(total_exemplos):
-    dataset = set()
+# Cada molde é (instrução, listas de componentes, função que monta entrada e
+# saída a partir de uma escolha de cada lista). As listas não têm repetição,
+# então cada combinação do produto cartesiano gera uma linha diferente.
+def _sem_repeticao(itens):
+    return list(dict.fromkeys(itens))
 
-    print(f"Iniciando a geração massiva de {total_exemplos} exemplos filtrados...")
+sujeitos_sociais = _sem_repeticao(
+    s.format(nome=n) for s in sujeitos_outros for n in (nomes if "{nome}" in s else [None])
+)
+acoes_sociais = _sem_repeticao(v.split(' com')[0] for v in verbos_sociais)
 
-    # Loop para garantir que atinjamos o número desejado de exemplos únicos e seguros
-    while len(dataset) < total_exemplos:
+MOLDES = [
+    ("Oriente sobre uma tarefa de rotina.",  # Rotina
+     [sujeitos_crianca, verbos_rotina, acoes_rotina, respostas_rotina_positiva],
+     lambda s, v, a, r: (f"{s} {v} {a}.", r)),
+    ("Incentive uma interação social positiva.",  # Social
+     [sujeitos_sociais, acoes_sociais],
+     lambda s, a: (f"{s} não quer {a} comigo.",
+                   "Às vezes as pessoas não querem brincar, e tudo bem. Que tal procurar outro amigo ou brincar de outra coisa?")),
+    ("Valide um sentimento e ofereça apoio.",  # Emocional
+     [verbos_emocionais, emocoes, causas_emocoes, respostas_apoio_emocional],
+     lambda v, em, c, r: (f"Eu {v} {em} {c}.", r)),  # as causas já começam com "porque"
+    ("Responda a uma pergunta de conhecimento.",  # Aprendizado
+     [verbos_aprendizado, conceitos, respostas_incentivo],
+     lambda v, c, r: (f"{v} {c}?", r)),
+]
 
-        molde = random.randint(1, 4)
 
-        instrucao, entrada, saida = "", "", ""
+def tamanho_molde(partes):
+    return math.prod(len(p) for p in partes)
 
-        if molde == 1: # Rotina
-            instrucao = "Oriente sobre uma tarefa de rotina."
-            entrada = f"{random.choice(sujeitos_crianca)} {random.choice(verbos_rotina)} {random.choice(acoes_rotina)}."
-            saida = random.choice(respostas_rotina_positiva)
 
-        elif molde == 2: # Social
-            instrucao = "Incentive uma interação social positiva."
-            nome_sujeito = random.choice(nomes)
-            sujeito = random.choice(sujeitos_outros).format(nome=nome_sujeito)
-            entrada = f"{sujeito} não quer {random.choice(verbos_sociais).split(' com')[0]} comigo."
-            saida = f"Às vezes as pessoas não querem brincar, e tudo bem. Que tal procurar outro amigo ou brincar de outra coisa?"
+def montar_linha(molde, indice):
+    """Linha número `indice` do produto cartesiano do molde (base mista)"""
+    instrucao, partes, montar = molde
+    escolhas = []
+    for parte in reversed(partes):
+        indice, resto = divmod(indice, len(parte))
+        escolhas.append(parte[resto])
+    entrada, saida = montar(*reversed(escolhas))
+    return instrucao, entrada, saida
 
-        elif molde == 3: # Emocional
-            instrucao = "Valide um sentimento e ofereça apoio."
-            entrada = f"Eu {random.choice(verbos_emocionais)} {random.choice(emocoes)} porque {random.choice(causas_emocoes)}."
-            saida = random.choice(respostas_apoio_emocional)
+# ==============================================================================
+# 4. EXPORTAÇÃO EM STREAMING
+# As linhas são geradas em blocos por um pool de processos e gravadas em
+# pedaços conforme ficam prontas, então a memória fica limitada ao buffer de
+# embaralhamento mais alguns blocos, qualquer que seja o tamanho do dataset.
+# ==============================================================================
 
-        elif molde == 4: # Aprendizado
-            instrucao = "Responda a uma pergunta de conhecimento."
-            entrada = f"{random.choice(verbos_aprendizado)} {random.choice(conceitos)}?"
-            saida = random.choice(respostas_incentivo)
+COLUNAS = ['Instrução', 'Entrada', 'Saída Esperada']
 
-        # APLICAÇÃO DO FILTRO DE SEGURANÇA
-        if not contem_palavra_impropria(entrada) and not contem_palavra_impropria(saida):
-            dataset.add((instrucao, entrada, saida))
+# Os moldes ocupam faixas consecutivas de um espaço global de índices
+TAMANHOS_MOLDES = [tamanho_molde(partes) for _, partes, _ in MOLDES]
+INICIOS_MOLDES = [sum(TAMANHOS_MOLDES[:i]) for i in range(len(MOLDES))]
+TOTAL_COMBINACOES = sum(TAMANHOS_MOLDES)
 
-        # Mostra o progresso a cada 1000 novos exemplos gerados
-        if len(dataset) % 1000 == 0 and len(dataset) > 0:
-            # Esta linha evita prints repetidos para o mesmo marco
-            current_progress = len(dataset)
-            if 'last_progress' not in locals() or last_progress != current_progress:
-                print(f"Progresso: {current_progress} de {total_exemplos} exemplos únicos e seguros...")
-                last_progress = current_progress
 
-    print(f"Geração concluída! Total de {len(dataset)} exemplos únicos e seguros.")
-    return list(dataset)
+def linha_global(indice):
+    m = bisect.bisect_right(INICIOS_MOLDES, indice) - 1
+    return montar_linha(MOLDES[m], indice - INICIOS_MOLDES[m])
 
-# ==============================================================================
-# 4. EXECUÇÃO
-# ==============================================================================
 
-# AQUI ESTÁ A META ATUALIZADA
-TOTAL_DE_EXEMPLOS = 25000
+class PermutacaoEmbaralhada:
+    """Bijeção pseudoaleatória de 0..n-1 nele mesmo, definida só pela semente.
+
+    Rede de Feistel sobre o menor domínio de 2^(2k) >= n, com "cycle walking"
+    para cair de volta em 0..n-1. Qualquer processo calcula a posição i sem
+    estado compartilhado, então fatias disjuntas de posições nunca repetem
+    índice: a deduplicação entre processos sai de graça e não depende de
+    quantos processos rodaram.
+    """
+
+    def __init__(self, n, semente, rodadas=4):
+        self.n = n
+        bits = max(2, (n - 1).bit_length())
+        self.meio = (bits + 1) // 2
+        self.mascara = (1 << self.meio) - 1
+        self.chaves = [random.Random(f"{semente}:{r}").getrandbits(64) for r in range(rodadas)]
+
+    def _rodadas(self, x):
+        esq, dir = x >> self.meio, x & self.mascara
+        for chave in self.chaves:
+            h = ((dir + chave) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+            h ^= h >> 29
+            esq, dir = dir, esq ^ (h & self.mascara)
+        return (esq << self.meio) | dir
+
+    def __call__(self, posicao):
+        x = self._rodadas(posicao)
+        while x >= self.n:
+            x = self._rodadas(x)
+        return x
+
+
+def gerar_bloco(inicio, fim, semente):
+    """Trabalho de um processo: as linhas das posições [inicio, fim) da
+    permutação global, já filtradas. Devolve (linhas, quantas filtradas)."""
+    permutacao = PermutacaoEmbaralhada(TOTAL_COMBINACOES, semente)
+    linhas = [linha_global(permutacao(pos)) for pos in range(inicio, fim)]
+    seguras = FILTRO.contem_em_lote(e + "\n" + s for _, e, s in linhas)
+    return [l for l, ruim in zip(linhas, seguras) if not ruim], seguras.count(True)
+
+
+class SaidaCSV:
+    """Mesmo formato de antes: separador '|' e BOM para abrir no Excel"""
+
+    def __init__(self, caminho):
+        self.arquivo = open(caminho, "w", newline="", encoding="utf-8-sig")
+        self.escritor = csv.writer(self.arquivo, delimiter="|", lineterminator="\n")
+        self.escritor.writerow(COLUNAS)
+
+    def escrever(self, linhas):
+        self.escritor.writerows(linhas)
 
-meu_dataset = gerar_dataset(TOTAL_DE_EXEMPLOS)
+    def fechar(self):
+        self.arquivo.close()
+
+
+class SaidaJSONL:
+    def __init__(self, caminho):
+        self.arquivo = open(caminho, "w", encoding="utf-8")
+
+    def escrever(self, linhas):
+        self.arquivo.writelines(json.dumps(dict(zip(COLUNAS, l)), ensure_ascii=False) + "\n" for l in linhas)
+
+    def fechar(self):
+        self.arquivo.close()
+
+
+class SaidaParquet:
+    """Um row group por pedaço gravado; precisa do pyarrow"""
+
+    def __init__(self, caminho):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Saída Parquet precisa do pyarrow: pip install pyarrow")
+        self.pa = pa
+        self.esquema = pa.schema([(c, pa.string()) for c in COLUNAS])
+        self.escritor = pq.ParquetWriter(caminho, self.esquema)
+
+    def escrever(self, linhas):
+        colunas = [list(c) for c in zip(*linhas)] if linhas else [[] for _ in COLUNAS]
+        self.escritor.write_table(self.pa.Table.from_arrays(colunas, schema=self.esquema))
+
+    def fechar(self):
+        self.escritor.close()
+
+
+FORMATOS = {"csv": SaidaCSV, "jsonl": SaidaJSONL, "parquet": SaidaParquet}
+
+
+def exportar_dataset(total_exemplos, caminho, formato="csv", processos=None,
+                     tamanho_bloco=10000, buffer_embaralhamento=10000, semente=None):
+    """Gera e grava `total_exemplos` linhas únicas e seguras em `caminho`.
+
+    Os blocos são distribuídos ao pool mas consumidos na ordem, então a
+    mesma semente gera o mesmo arquivo com qualquer número de processos.
+    Devolve as primeiras linhas gravadas, para mostrar na tela.
+    """
+    if semente is None:
+        semente = random.randrange(2 ** 32)
+    print(f"Combinações únicas possíveis: {TOTAL_COMBINACOES} "
+          f"({' + '.join(map(str, TAMANHOS_MOLDES))} por molde).")
+    if total_exemplos > TOTAL_COMBINACOES:
+        print(f"Aviso: {total_exemplos} exemplos pedidos, mas só existem {TOTAL_COMBINACOES}; gerando {TOTAL_COMBINACOES}.")
+        total_exemplos = TOTAL_COMBINACOES
+    print(f"Iniciando a geração de {total_exemplos} exemplos filtrados (semente {semente})...")
+
+    embaralhar = random.Random(semente)
+    buffer = []
+    primeiras = []
+    gravadas = filtradas = 0
+    saida = FORMATOS[formato](caminho)
+
+    def gravar(linhas):
+        nonlocal gravadas
+        saida.escrever(linhas)
+        if len(primeiras) < 10:
+            primeiras.extend(linhas[:10 - len(primeiras)])
+        gravadas += len(linhas)
+
+    try:
+        with multiprocessing.Pool(processos) as pool:
+            # Poucos blocos em voo: os processos não correm à frente da gravação
+            em_voo = collections.deque()
+            blocos = ((i, min(i + tamanho_bloco, TOTAL_COMBINACOES))
+                      for i in range(0, TOTAL_COMBINACOES, tamanho_bloco))
+            limite = 2 * (processos or os.cpu_count() or 1)
+            aceitas = 0
+            while aceitas < total_exemplos:
+                while len(em_voo) < limite:
+                    bloco = next(blocos, None)
+                    if bloco is None:
+                        break
+                    em_voo.append(pool.apply_async(gerar_bloco, (*bloco, semente)))
+                if not em_voo:
+                    break  # espaço esgotado (só acontece se o filtro cortou linhas)
+                linhas, cortadas = em_voo.popleft().get()
+                filtradas += cortadas
+                linhas = linhas[:total_exemplos - aceitas]
+                aceitas += len(linhas)
+
+                # Buffer de embaralhamento: cada linha nova entra numa posição
+                # sorteada e a que estava lá sai para o arquivo
+                if buffer_embaralhamento <= 0:
+                    pedaco = linhas  # sem buffer: grava na ordem da permutação
+                else:
+                    pedaco = []
+                    for linha in linhas:
+                        if len(buffer) < buffer_embaralhamento:
+                            buffer.append(linha)
+                            continue
+                        j = embaralhar.randrange(len(buffer))
+                        pedaco.append(buffer[j])
+                        buffer[j] = linha
+                if pedaco:
+                    gravar(pedaco)
+                print(f"Progresso: {aceitas} de {total_exemplos} exemplos únicos e seguros...")
+            pool.terminate()
+        embaralhar.shuffle(buffer)
+        if buffer:
+            gravar(buffer)
+    finally:
+        saida.fechar()
+
+    print(f"Geração concluída! Total de {gravadas} exemplos únicos e seguros ({filtradas} barrados pelo filtro).")
+    return primeiras
+
+# ==============================================================================
+# 5. EXECUÇÃO
+# ==============================================================================
 
-# Pega o número exato de exemplos solicitados
-final_dataset_list = meu_dataset[:TOTAL_DE_EXEMPLOS]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o dataset de instruções em streaming")
+    # AQUI ESTÁ A META ATUALIZADA
+    parser.add_argument("--total", type=int, default=25000, help="Número de exemplos")
+    # Novo nome de arquivo para refletir a quantidade e o filtro
+    parser.add_argument("--saida", default="dataset_25k_filtrado.csv")
+    parser.add_argument("--formato", choices=sorted(FORMATOS), help="Padrão: pela extensão de --saida")
+    parser.add_argument("--processos", type=int, default=None, help="Padrão: um por CPU")
+    parser.add_argument("--bloco", type=int, default=10000, help="Linhas por tarefa do pool")
+    parser.add_argument("--buffer-embaralhamento", type=int, default=10000,
+                        help="Linhas no buffer de embaralhamento (0 = ordem da permutação)")
+    parser.add_argument("--semente", type=int, default=None, help="Torna a saída reproduzível")
+    args = parser.parse_args()
 
-df = pd.DataFrame(final_dataset_list, columns=['Instrução', 'Entrada', 'Saída Esperada'])
-df = df.sample(frac=1).reset_index(drop=True)
+    formato = args.formato or os.path.splitext(args.saida)[1].lstrip(".").lower()
+    if formato not in FORMATOS:
+        parser.error(f"formato desconhecido '{formato}'; use --formato {{{','.join(sorted(FORMATOS))}}}")
 
-# Novo nome de arquivo para refletir a quantidade e o filtro
-df.to_csv('dataset_25k_filtrado.csv', index=False, sep='|', encoding='utf-8-sig')
+    primeiras = exportar_dataset(args.total, args.saida, formato, args.processos,
+                                 args.bloco, args.buffer_embaralhamento, args.semente)
 
-print(f"\nArquivo 'dataset_25k_filtrado.csv' salvo com sucesso!")
-print("\n--- 10 Primeiros Exemplos do Dataset Final ---")
-print(df.head(10))
\ No newline at end of file
+    print(f"\nArquivo '{args.saida}' salvo com sucesso!")
+    print("\n--- 10 Primeiros Exemplos do Dataset Final ---")
+    for instrucao, entrada, saida in primeiras:
+        print(f"{instrucao} | {entrada} | {saida}")
@@ -0,0 +1,114 @@
+"""Métricas e log em segundo plano dos nós do anel (Servidor.py).
+
+As métricas ficam em memória e saem em GET /metrics: contadores,
+histogramas de latência com baldes fixos e medidores calculados na hora
+da leitura (threads ativas, filas). Observar um valor custa uma busca
+binária e um lock curto, então pode ficar no caminho quente.
+
+O log passa por um QueueHandler: quem registra só enfileira a linha e uma
+thread do QueueListener escreve no stdout, então um terminal lento não
+segura a resposta de nenhuma requisição.
+"""
+import atexit
+import bisect
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from collections import Counter
+from typing import Callable, Dict, List
+
+# Limites superiores dos baldes, em segundos (o último balde é +inf)
+LIMITES_LATENCIA = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+class Histograma:
+    def __init__(self, limites: List[float] = LIMITES_LATENCIA):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def quantil(self, q: float) -> float:
+        """Estimativa pelo limite superior do balde onde o quantil cai"""
+        if not self.total:
+            return 0.0
+        alvo = q * self.total
+        acumulado = 0
+        for limite, contagem in zip(self.limites + [float("inf")], self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return limite if limite != float("inf") else self.limites[-1]
+        return self.limites[-1]
+
+    def resumo(self) -> dict:
+        return {
+            "total": self.total,
+            "soma": round(self.soma, 6),
+            "media": round(self.soma / self.total, 6) if self.total else 0.0,
+            "p50": self.quantil(0.50),
+            "p99": self.quantil(0.99),
+            "baldes": {str(l): c for l, c in zip(self.limites + ["+inf"], self.contagens)},
+        }
+
+
+class Metricas:
+    """Registro de métricas do nó; `rotulo` separa as séries (path, destino...)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.contadores: Dict[str, Counter] = {}
+        self.histogramas: Dict[str, Dict[str, Histograma]] = {}
+        self.medidores: Dict[str, Callable[[], object]] = {}
+
+    def contar(self, nome: str, rotulo: str = "", n: int = 1):
+        with self.lock:
+            self.contadores.setdefault(nome, Counter())[rotulo] += n
+
+    def observar(self, nome: str, rotulo: str, valor: float):
+        with self.lock:
+            serie = self.histogramas.setdefault(nome, {})
+            if rotulo not in serie:
+                serie[rotulo] = Histograma()
+            serie[rotulo].observar(valor)
+
+    def medidor(self, nome: str, funcao: Callable[[], object]):
+        """Valor calculado só quando /metrics é lido"""
+        self.medidores[nome] = funcao
+
+    def zerar(self):
+        with self.lock:
+            self.contadores.clear()
+            self.histogramas.clear()
+
+    def exportar(self) -> dict:
+        with self.lock:
+            saida = {
+                "contadores": {nome: dict(c) for nome, c in self.contadores.items()},
+                "histogramas": {nome: {r: h.resumo() for r, h in serie.items()}
+                                for nome, serie in self.histogramas.items()},
+            }
+        saida["medidores"] = {nome: f() for nome, f in self.medidores.items()}
+        return saida
+
+
+def configurar_log(no_id: int, nivel: str = "INFO") -> logging.Logger:
+    """Logger "anel" com escrita em segundo plano (esvaziada na saída do processo)"""
+    saida = logging.StreamHandler(sys.stdout)
+    saida.setFormatter(logging.Formatter(
+        f"%(asctime)s.%(msecs)03d no={no_id} %(levelname)s %(threadName)s %(message)s", "%H:%M:%S"))
+    fila: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    ouvinte = logging.handlers.QueueListener(fila, saida)
+    log = logging.getLogger("anel")
+    log.handlers[:] = [logging.handlers.QueueHandler(fila)]
+    log.setLevel(nivel)
+    log.propagate = False
+    ouvinte.start()
+    atexit.register(ouvinte.stop)
+    return log
@@ -0,0 +1,435 @@
+"""Persistência do estado dos nós: a eleição do Servidor.py e a lista do
+node.py de 2025-08-28.
+
+Nos modos "arquivo" e "log" nenhuma gravação acontece no caminho da
+resposta: `salvar` só entrega o estado a uma thread de fundo, que grava em
+lote.
+
+- "arquivo": sobrescreve eleicao_node{ID}.json com o estado mais recente
+  (estados intermediários que chegam enquanto o disco grava são pulados).
+- "log": acrescenta uma linha JSON por estado em eleicao_node{ID}.log e
+  compacta o arquivo (só o último estado) a cada COMPACTAR_A_CADA linhas.
+- "segmentos": LogSegmentado em estado_node{ID}/. `salvar` só volta depois
+  do fsync, então um estado já confirmado não se perde numa queda.
+- "nenhuma": não grava nada.
+
+LogSegmentado é um log append-only em arquivos de segmento:
+- cada registro é um valor JSON com cabeçalho (índice, tamanho, crc32);
+- escritas concorrentes dividem o mesmo write + fsync (group commit);
+- um snapshot guarda o estado até um índice, e os segmentos que ele cobre
+  são apagados;
+- na partida, o último snapshot e os registros depois dele são relidos com
+  mmap, e um registro cortado no fim do último segmento (queda no meio da
+  escrita, nunca confirmado) é descartado.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+COMPACTAR_A_CADA = 1000
+
+# Segmento novo depois de TAMANHO_SEGMENTO bytes
+TAMANHO_SEGMENTO = 64 * 1024 * 1024
+# precisa_snapshot() fica True depois de SNAPSHOT_A_CADA bytes gravados desde o último
+SNAPSHOT_A_CADA = 64 * 1024 * 1024
+# Cabeçalho de cada registro: índice, tamanho do corpo, crc32 do corpo
+_CABECALHO = struct.Struct("!QII")
+
+log = logging.getLogger("anel")
+
+
+class PersistenciaEleicao:
+    """Interface: salvar() não bloqueia (exceto com `bloqueia`); recuperar()
+    é usado na partida"""
+
+    bloqueia = False  # salvar() espera o disco
+
+    def salvar(self, estado: dict):
+        pass
+
+    def recuperar(self) -> Optional[dict]:
+        return None
+
+    def fechar(self):
+        pass
+
+
+class PersistenciaNenhuma(PersistenciaEleicao):
+    pass
+
+
+class _GravadorEmFundo(PersistenciaEleicao):
+    """Acumula estados pendentes e os entrega em lote a _gravar()"""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.pendentes: List[dict] = []
+        self.cond = threading.Condition()
+        self.fechado = False
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def salvar(self, estado: dict):
+        with self.cond:
+            self.pendentes.append(estado)
+            self.cond.notify()
+
+    def fechar(self):
+        with self.cond:
+            self.fechado = True
+            self.cond.notify()
+        self.thread.join()
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                while not self.pendentes and not self.fechado:
+                    self.cond.wait()
+                lote, self.pendentes = self.pendentes, []
+                fechado = self.fechado
+            if lote:
+                try:
+                    self._gravar(lote)
+                except OSError as e:
+                    log.error("[erro] Falha ao gravar %s: %s", self.caminho, e)
+            if fechado:
+                return
+
+    def _gravar(self, lote: List[dict]):
+        raise NotImplementedError
+
+
+class PersistenciaArquivo(_GravadorEmFundo):
+    def _gravar(self, lote: List[dict]):
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(lote[-1], f, ensure_ascii=False)
+        os.replace(temporario, self.caminho)
+
+    def recuperar(self) -> Optional[dict]:
+        try:
+            with open(self.caminho, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+
+class PersistenciaLog(_GravadorEmFundo):
+    def __init__(self, caminho: str, compactar_a_cada: int = COMPACTAR_A_CADA):
+        self.compactar_a_cada = compactar_a_cada
+        self.linhas = 0
+        super().__init__(caminho)
+
+    def _gravar(self, lote: List[dict]):
+        dados = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in lote)
+        with open(self.caminho, "a", encoding="utf-8") as f:
+            f.write(dados)
+        self.linhas += len(lote)
+        if self.linhas >= self.compactar_a_cada:
+            self._compactar(lote[-1])
+
+    def _compactar(self, ultimo: dict):
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(json.dumps(ultimo, ensure_ascii=False) + "\n")
+        os.replace(temporario, self.caminho)
+        self.linhas = 1
+
+    def recuperar(self) -> Optional[dict]:
+        # A última linha completa vence; uma linha cortada por queda é ignorada
+        ultimo = None
+        try:
+            with open(self.caminho, encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        ultimo = json.loads(linha)
+                    except json.JSONDecodeError:
+                        continue
+                    self.linhas += 1
+        except OSError:
+            return None
+        return ultimo
+
+
+class LogCorrompido(ValueError):
+    """Registro inválido fora do fim do último segmento (não é queda na escrita)"""
+
+
+# fdatasync basta para acréscimos (o tamanho do arquivo entra junto)
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+
+def _sincronizar_pasta(pasta: str):
+    # Sem isso um arquivo criado ou renomeado pode sumir numa queda
+    fd = os.open(pasta, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class LogSegmentado:
+    """Log append-only de registros JSON em segmentos, com snapshots.
+
+    pasta/{primeiro índice:020d}.seg guarda registros a partir daquele
+    índice; pasta/{índice:020d}.snap guarda o estado até aquele índice
+    (inclusive), nos mesmos registros com cabeçalho. Uso: recuperar() uma
+    vez na partida, depois acrescentar() e, quando precisa_snapshot(),
+    snapshot() (pode ser em outra thread).
+    """
+
+    def __init__(self, pasta: str, tamanho_segmento: int = TAMANHO_SEGMENTO,
+                 snapshot_a_cada: int = SNAPSHOT_A_CADA):
+        self.pasta = pasta
+        self.tamanho_segmento = tamanho_segmento
+        self.snapshot_a_cada = snapshot_a_cada
+        self.ultimo = 0  # índice do último registro durável
+        self.segmentos: List[int] = []  # primeiro índice de cada segmento, em ordem
+        self.arquivo = None  # segmento aberto para escrita, sem buffer
+        self.bytes_desde_snapshot = 0
+        self.snapshot_em_andamento = False
+        # Group commit: quem encontra o log livre grava a fila inteira
+        self.fila: List[list] = []  # pedidos [registro, índice ou exceção]
+        self.cond = threading.Condition()
+        self.gravando = False
+        os.makedirs(pasta, exist_ok=True)
+
+    def _caminho(self, indice: int, extensao: str) -> str:
+        return os.path.join(self.pasta, f"{indice:020d}.{extensao}")
+
+    def _listar(self, extensao: str) -> List[int]:
+        return sorted(int(nome.split(".")[0]) for nome in os.listdir(self.pasta)
+                      if nome.endswith("." + extensao) and nome.split(".")[0].isdigit())
+
+    @staticmethod
+    def _registros(caminho: str) -> Iterator[Tuple[int, int, Optional[bytes]]]:
+        """(índice, fim do registro, corpo) de cada registro do arquivo, lido
+        por mmap. Um registro cortado ou com crc errado termina a leitura com
+        corpo None, e o fim devolvido é onde ele começa."""
+        with open(caminho, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos = 0
+                while pos < len(mm):
+                    if pos + _CABECALHO.size > len(mm):
+                        yield 0, pos, None
+                        return
+                    indice, tamanho, crc = _CABECALHO.unpack_from(mm, pos)
+                    fim = pos + _CABECALHO.size + tamanho
+                    corpo = mm[pos + _CABECALHO.size:fim]
+                    if fim > len(mm) or zlib.crc32(corpo) != crc:
+                        yield indice, pos, None
+                        return
+                    yield indice, fim, corpo
+                    pos = fim
+
+    def recuperar(self, aplicar: Callable[[object], None]) -> int:
+        """Chama `aplicar` com cada registro do último snapshot e depois com
+        cada registro gravado após ele; devolve o índice do último"""
+        snapshots = self._listar("snap")
+        base = snapshots[-1] if snapshots else 0
+        if snapshots:
+            for _, _, corpo in self._registros(self._caminho(base, "snap")):
+                if corpo is None:
+                    raise LogCorrompido(f"snapshot {base} inválido")
+                aplicar(json.loads(corpo))
+        for antigo in snapshots[:-1]:
+            os.remove(self._caminho(antigo, "snap"))
+        for nome in os.listdir(self.pasta):
+            if nome.endswith(".tmp"):
+                os.remove(os.path.join(self.pasta, nome))  # snapshot que não terminou
+
+        self.ultimo = base
+        self.segmentos = self._listar("seg")
+        for i, primeiro in enumerate(self.segmentos):
+            caminho = self._caminho(primeiro, "seg")
+            anterior = 0
+            cortar = None
+            for indice, fim, corpo in self._registros(caminho):
+                if corpo is None:
+                    if i != len(self.segmentos) - 1:
+                        raise LogCorrompido(f"registro inválido no meio de {caminho}")
+                    cortar = fim
+                    break
+                if indice > base:  # os anteriores já estão no snapshot
+                    if indice != self.ultimo + 1:
+                        raise LogCorrompido(f"{caminho}: esperado registro {self.ultimo + 1}, achado {indice}")
+                    aplicar(json.loads(corpo))
+                    self.ultimo = indice
+                    self.bytes_desde_snapshot += fim - anterior
+                anterior = fim
+            if cortar is not None:
+                # Queda no meio de uma escrita que nunca foi confirmada
+                log.warning("[persistencia] Descartando o fim cortado de %s", caminho)
+                os.truncate(caminho, cortar)
+
+        if self.segmentos:
+            self.arquivo = open(self._caminho(self.segmentos[-1], "seg"), "ab", buffering=0)
+        else:
+            self._novo_segmento()
+        return self.ultimo
+
+    def _novo_segmento(self):
+        # Abre o novo antes de fechar o atual: se falhar, segue no atual
+        novo = open(self._caminho(self.ultimo + 1, "seg"), "ab", buffering=0)
+        if self.arquivo is not None:
+            self.arquivo.close()
+        self.arquivo = novo
+        self.segmentos.append(self.ultimo + 1)
+        _sincronizar_pasta(self.pasta)
+
+    def acrescentar(self, registro) -> int:
+        """Grava `registro` e só volta depois do fsync; devolve o índice dele.
+        Chamadas concorrentes são gravadas juntas, com um fsync só."""
+        pedido = [registro, None]
+        with self.cond:
+            self.fila.append(pedido)
+            while pedido[1] is None:
+                if self.gravando:
+                    self.cond.wait()
+                    continue
+                self.gravando = True
+                lote, self.fila = self.fila, []
+                self.cond.release()
+                try:
+                    resultado = self._gravar([p[0] for p in lote])
+                except Exception as e:
+                    resultado = e  # todo o lote recebe o erro, ninguém fica esperando
+                finally:
+                    self.cond.acquire()
+                    self.gravando = False
+                for i, p in enumerate(lote):
+                    p[1] = resultado if isinstance(resultado, Exception) else resultado + i
+                self.cond.notify_all()
+        if isinstance(pedido[1], Exception):
+            raise pedido[1]
+        return pedido[1]
+
+    def _gravar(self, registros: list):
+        """Escreve e sincroniza o lote; devolve o índice do primeiro (ou o erro)"""
+        primeiro = self.ultimo + 1
+        partes = []
+        for indice, registro in enumerate(registros, primeiro):
+            corpo = json.dumps(registro, ensure_ascii=False).encode("utf-8")
+            partes.append(_CABECALHO.pack(indice, len(corpo), zlib.crc32(corpo)) + corpo)
+        dados = b"".join(partes)
+        inicio = self.arquivo.tell()
+        try:
+            restante = memoryview(dados)
+            while restante:
+                restante = restante[self.arquivo.write(restante):]
+            _fdatasync(self.arquivo.fileno())
+        except OSError as e:
+            log.error("[erro] Falha ao gravar em %s: %s", self.pasta, e)
+            # Nada do lote foi confirmado: tira do segmento o que chegou a ser escrito
+            try:
+                os.ftruncate(self.arquivo.fileno(), inicio)
+                self.arquivo.seek(inicio)
+            except OSError:
+                pass  # a próxima partida descarta o registro cortado
+            return e
+        self.ultimo += len(registros)
+        self.bytes_desde_snapshot += len(dados)
+        if self.arquivo.tell() >= self.tamanho_segmento:
+            try:
+                self._novo_segmento()
+            except OSError as e:
+                # O lote já é durável; tenta trocar de segmento na próxima gravação
+                log.error("[erro] Falha ao abrir segmento novo em %s: %s", self.pasta, e)
+        return primeiro
+
+    def precisa_snapshot(self) -> bool:
+        return self.bytes_desde_snapshot >= self.snapshot_a_cada and not self.snapshot_em_andamento
+
+    def snapshot(self, indice: int, registros: Iterable):
+        """Grava `registros` como o estado até `indice` e apaga os segmentos
+        que só têm registros até ele. Quem chama garante que o estado é o do
+        registro `indice` (ex.: capturado logo depois do acrescentar dele)."""
+        with self.cond:
+            if self.snapshot_em_andamento:
+                return
+            self.snapshot_em_andamento = True
+            while self.gravando:
+                self.cond.wait()
+            # Segmento novo para que o atual possa ser apagado no próximo snapshot
+            if self.segmentos[-1] <= self.ultimo:
+                try:
+                    self._novo_segmento()
+                except OSError as e:
+                    log.error("[erro] Falha ao abrir segmento novo em %s: %s", self.pasta, e)
+                    self.snapshot_em_andamento = False
+                    return
+            self.bytes_desde_snapshot = 0
+        try:
+            temporario = self._caminho(indice, "tmp")
+            with open(temporario, "wb") as f:
+                for i, registro in enumerate(registros, 1):
+                    corpo = json.dumps(registro, ensure_ascii=False).encode("utf-8")
+                    f.write(_CABECALHO.pack(i, len(corpo), zlib.crc32(corpo)) + corpo)
+                f.flush()
+                _fdatasync(f.fileno())
+            os.replace(temporario, self._caminho(indice, "snap"))
+            _sincronizar_pasta(self.pasta)
+
+            for antigo in self._listar("snap"):
+                if antigo < indice:
+                    os.remove(self._caminho(antigo, "snap"))
+            with self.cond:
+                # Segmento k só tem registros até (primeiro do k+1) - 1
+                while len(self.segmentos) > 1 and self.segmentos[1] - 1 <= indice:
+                    os.remove(self._caminho(self.segmentos.pop(0), "seg"))
+            log.info("[persistencia] Snapshot até o registro %s em %s", indice, self.pasta)
+        except OSError as e:
+            log.error("[erro] Falha ao gravar snapshot em %s: %s", self.pasta, e)
+        finally:
+            with self.cond:
+                self.snapshot_em_andamento = False
+
+    def fechar(self):
+        with self.cond:
+            while self.gravando:
+                self.cond.wait()
+            if self.arquivo is not None:
+                self.arquivo.close()
+                self.arquivo = None
+
+
+class PersistenciaSegmentada(PersistenciaEleicao):
+    """Cada estado é um registro do LogSegmentado; o snapshot guarda só o
+    último. salvar() espera o fsync (estados salvos juntos dividem o mesmo)."""
+
+    bloqueia = True
+
+    def __init__(self, pasta: str, snapshot_a_cada: int = 1024 * 1024):
+        self.log = LogSegmentado(pasta, tamanho_segmento=snapshot_a_cada, snapshot_a_cada=snapshot_a_cada)
+        # O log precisa ser relido antes da primeira escrita
+        estados: List[dict] = []
+        self.log.recuperar(estados.append)
+        self.ultimo = estados[-1] if estados else None
+
+    def recuperar(self) -> Optional[dict]:
+        return self.ultimo
+
+    def salvar(self, estado: dict):
+        indice = self.log.acrescentar(estado)
+        if self.log.precisa_snapshot():
+            threading.Thread(target=self.log.snapshot, args=(indice, [estado]), daemon=True).start()
+
+    def fechar(self):
+        self.log.fechar()
+
+
+def criar_persistencia(tipo: str, no_id: int) -> PersistenciaEleicao:
+    if tipo == "arquivo":
+        return PersistenciaArquivo(f"eleicao_node{no_id}.json")
+    elif tipo == "log":
+        return PersistenciaLog(f"eleicao_node{no_id}.log")
+    elif tipo == "segmentos":
+        return PersistenciaSegmentada(f"estado_node{no_id}")
+    return PersistenciaNenhuma()
@@ -1,49 +1,698 @@
+import argparse
+import asyncio
+import bisect
+import concurrent.futures
+import http
 import http.server
 import socketserver
 import json
+import queue
 import requests
-import sys
 import threading
-from typing import Dict, Tuple
+import time
+import urllib.parse
+from collections import Counter
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Tuple
+
+from Formato import FORMATOS, TIPO_JSON, FormatoNaoSuportado, desserializar, serializar
+from Heartbeat import MonitorHeartbeat
+from Metricas import Metricas, configurar_log
+from Persistencia import criar_persistencia
 
 # =================== CONFIGURAÇÕES ===================
 # ID e porta devem ser passados via linha de comando:
-# Exemplo: python server_ring_json.py 1 8000
-ID = int(sys.argv[1]) if len(sys.argv) > 1 else 1
-PORT = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+# Exemplo: python Servidor.py 1 8000 [--runtime asyncio] [--nos nos.json] [--entrar URL]
+#                             [--algoritmo chang-roberts] [--persistencia log] [--heartbeat 0.5]
+#                             [--formato compacto] [--log-nivel DEBUG]
+parser = argparse.ArgumentParser()
+parser.add_argument("id", type=int, nargs="?", default=1, help="ID do nó no anel")
+parser.add_argument("porta", type=int, nargs="?", default=8000, help="Porta HTTP do nó")
+parser.add_argument("--runtime", choices=["threads", "asyncio"], default="threads",
+                    help="threads: ThreadingTCPServer; asyncio: servidor e canais de saída em um event loop")
+parser.add_argument("--nos", type=str, help="Arquivo JSON com a tabela de nós {\"id\": \"url\"}")
+parser.add_argument("--entrar", type=str, help="URL de um nó do anel para entrar dinamicamente")
+parser.add_argument("--url", type=str, help="URL pela qual os outros nós alcançam este nó")
+parser.add_argument("--algoritmo", choices=["anel", "chang-roberts", "bully"], default="anel",
+                    help="anel: token com a lista de ids; chang-roberts: token só com o maior id; "
+                         "bully: desafia os ids maiores diretamente (todos os nós devem usar o mesmo)")
+parser.add_argument("--persistencia", choices=["arquivo", "log", "segmentos", "nenhuma"], default="arquivo",
+                    help="Onde guardar o estado da eleição (arquivo e log gravam em segundo plano; "
+                         "segmentos só responde depois do fsync)")
+parser.add_argument("--heartbeat", type=float, default=0.5,
+                    help="Intervalo dos heartbeats UDP do coordenador em segundos (0 desliga)")
+parser.add_argument("--limiar-phi", type=float, default=8.0,
+                    help="Phi acima do qual o coordenador é considerado falho")
+parser.add_argument("--formato", choices=FORMATOS, default="json",
+                    help="Corpo das mensagens /eleicao e /coordenador enviadas a outros nós "
+                         "(quem não entender responde 415 e recebe JSON)")
+parser.add_argument("--reintentar-inativo", type=float, default=5.0,
+                    help="Segundos até voltar a tentar um nó marcado como inativo")
+parser.add_argument("--timeout-eleicao", type=float, default=10.0,
+                    help="Segundos sem anúncio até este nó refazer uma eleição em andamento")
+parser.add_argument("--log-nivel", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO",
+                    help="DEBUG mostra cada mensagem enviada ao vizinho")
+args = parser.parse_args()
+
+ID = args.id
+PORT = args.porta
+RUNTIME = args.runtime
+ALGORITMO = args.algoritmo
+FORMATO = args.formato
+MINHA_URL = (args.url or f"http://127.0.0.1:{PORT}").rstrip("/")
+
+# Log escrito por uma thread própria (ver Metricas.py) e métricas do /metrics
+log = configurar_log(ID, args.log_nivel)
+metricas = Metricas()
 
 # Dicionário com todos os nós do anel (ID -> URL base)
-# Dicionário com todos os nós do anel (ID -> URL base)
-nos_conectados: Dict[str, str] = {
-    "1": "http://127.0.0.1:8000",
-    "2": "http://127.0.0.1:8001",
-    "3": "http://127.0.0.1:8002",
-}
+if args.nos:
+    with open(args.nos, encoding="utf-8") as f:
+        nos_conectados: Dict[str, str] = {str(k): v for k, v in json.load(f).items()}
+elif args.entrar:
+    # A tabela completa chega na resposta do /membros/entrar
+    nos_conectados = {str(ID): MINHA_URL}
+else:
+    nos_conectados = {
+        "1": "http://127.0.0.1:8000",
+        "2": "http://127.0.0.1:8001",
+        "3": "http://127.0.0.1:8002",
+    }
 
 coordenador_id = None  # ID do coordenador atual
+# Épocas numeram as eleições: anúncios de épocas antigas são descartados
+epoca = 0  # maior época de eleição vista por este nó
+epoca_coordenador = 0  # época em que coordenador_id foi decidido
+ultima_eleicao: dict = {}  # último token de eleição visto por este nó
+persistencia = criar_persistencia(args.persistencia, ID)
+
+# Tamanho máximo da fila de saída de cada vizinho
+TAMANHO_FILA_SAIDA = 1024
+
+# Bully: quanto esperar pelo anúncio depois que um nó maior respondeu
+TIMEOUT_BULLY = 3.0
+
+# Eleição em andamento há mais que isso sem anúncio é refeita (época nova)
+TIMEOUT_ELEICAO = args.timeout_eleicao
+
+# Máximo de itens por página em GET /dados?since=N
+LIMITE_PAGINA = 1000
 # =====================================================
 
 
+# -------- Membros do anel --------
+# ids_ordenados é um índice ordenado de nos_conectados, refeito só quando
+# alguém entra ou sai; nos_inativos guarda quem falhou ao receber mensagem
+# e até quando ele é pulado (depois disso volta a ser tentado).
+membros_lock = threading.Lock()
+ids_ordenados = sorted(int(x) for x in nos_conectados)
+nos_inativos: Dict[int, float] = {}  # id -> time.monotonic() em que volta a ser tentado
+
+
+def _reindexar():
+    """Refaz o índice ordenado (chamar com membros_lock adquirido)"""
+    global ids_ordenados
+    ids_ordenados = sorted(int(x) for x in nos_conectados)
+
+
+def adicionar_membro(no_id: int, url: str):
+    with membros_lock:
+        nos_conectados[str(no_id)] = url.rstrip("/")
+        nos_inativos.pop(no_id, None)
+        _reindexar()
+    log.info("[membros] Nó %s entrou no anel (%s)", no_id, url)
+
+
+def remover_membro(no_id: int):
+    with membros_lock:
+        if nos_conectados.pop(str(no_id), None) is None:
+            return
+        nos_inativos.pop(no_id, None)
+        _reindexar()
+    log.info("[membros] Nó %s saiu do anel", no_id)
+
+
+def marcar_inativo(no_id: int):
+    with membros_lock:
+        nos_inativos[no_id] = time.monotonic() + args.reintentar_inativo
+
+
+def marcar_ativo(no_id: int):
+    """Chegou mensagem direta de `no_id`: ele está vivo"""
+    with membros_lock:
+        if nos_inativos.pop(no_id, None) is not None:
+            log.info("[membros] Nó %s voltou a responder", no_id)
+
+
+def inativo(no_id: int) -> bool:
+    """True se `no_id` falhou há pouco; prazo vencido apaga a marca para
+    que a próxima mensagem o tente de novo"""
+    prazo = nos_inativos.get(no_id)
+    if prazo is None:
+        return False
+    if time.monotonic() < prazo:
+        return True
+    nos_inativos.pop(no_id, None)
+    return False
+
+
+def lista_inativos() -> List[int]:
+    with membros_lock:
+        return sorted(i for i in list(nos_inativos) if inativo(i))
+
+
 # -------- Função auxiliar: próximo no do anel --------
-def proximo_no() -> Tuple[int, str]:
-    ids = sorted([int(x) for x in nos_conectados.keys()])
-    pos = ids.index(ID)
-    prox_id = ids[(pos + 1) % len(ids)]
-    return prox_id, nos_conectados[str(prox_id)]
+def proximo_no(apos: Optional[int] = None) -> Tuple[int, str]:
+    """Sucessor vivo de `apos` (padrão: este nó) via busca binária no índice"""
+    with membros_lock:
+        ids = ids_ordenados
+        pos = bisect.bisect_right(ids, ID if apos is None else apos)
+        for i in range(len(ids)):
+            prox_id = ids[(pos + i) % len(ids)]
+            if prox_id == ID or not inativo(prox_id):
+                return prox_id, nos_conectados[str(prox_id)]
+    return ID, MINHA_URL
+
+
+# -------- Contadores de mensagens enviadas --------
+estatisticas_lock = threading.Lock()
+mensagens_enviadas: Counter = Counter()  # path -> mensagens
+bytes_enviados: Counter = Counter()  # path -> bytes do corpo
+
+
+def registrar_envio(path: str, tamanho: int):
+    with estatisticas_lock:
+        mensagens_enviadas[path] += 1
+        bytes_enviados[path] += tamanho
+
+
+def registrar_requisicao(metodo: str, path: str, code: int, duracao: float):
+    # Só paths conhecidos viram série própria, para o /metrics não crescer sem limite
+    rotulo = f"{metodo} {urllib.parse.urlsplit(path).path if code != 404 else '(desconhecido)'}"
+    metricas.contar("requisicoes", rotulo)
+    metricas.observar("latencia_requisicao", rotulo, duracao)
+    if code >= 400:
+        metricas.contar("respostas_erro", f"{rotulo} {code}")
+
+
+def registrar_encaminhamento(prox_id: int, path: str, enfileirado: float, inicio: float, ok: bool):
+    """Tempo na fila do canal e no POST ao vizinho (o custo de cada salto)"""
+    fim = time.perf_counter()
+    metricas.observar("espera_fila_saida", path, inicio - enfileirado)
+    if ok:
+        metricas.observar("latencia_encaminhamento", path, fim - inicio)
+    else:
+        metricas.contar("falhas_envio", f"Nó {prox_id} {path}")
+
+
+def codificar(payload: dict) -> bytes:
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+JSON_HEADERS = {"Content-Type": TIPO_JSON}
+
+# Só o tráfego de eleição usa o formato escolhido em --formato
+CAMINHOS_COMPACTOS = {"/eleicao", "/coordenador"}
+destinos_so_json = set()  # URLs que responderam 415 ao formato compacto
+
+
+def codificar_para(url: str, path: str, payload: dict) -> Tuple[bytes, str]:
+    """Corpo e Content-Type da mensagem para o nó em `url`"""
+    if FORMATO == "json" or path not in CAMINHOS_COMPACTOS or url in destinos_so_json:
+        return codificar(payload), TIPO_JSON
+    return serializar(payload, FORMATO)
+
+
+def recusou_formato(url: str, status: int, tipo: str) -> bool:
+    """True se `url` recusou o formato (415): daqui em diante recebe JSON"""
+    if status != 415 or tipo == TIPO_JSON:
+        return False
+    log.warning("[formato] %s não aceita %s, voltando para JSON", url, tipo)
+    destinos_so_json.add(url)
+    return True
+
+
+# -------- Canal de saída persistente por vizinho --------
+class CanalSaida:
+    """Conexão keep-alive com um vizinho, alimentada por uma fila limitada.
+
+    Um único worker consome a fila e reaproveita a mesma conexão TCP
+    (requests.Session) para todas as mensagens, em vez de abrir uma
+    conexão e uma thread novas a cada salto. Réplicas acumuladas na fila
+    saem juntas em um POST só (ver juntar_replicas).
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.fila: "queue.Queue[Tuple[int, str, dict, float]]" = queue.Queue(maxsize=TAMANHO_FILA_SAIDA)
+        self.sessao = requests.Session()
+        self.sessao.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.worker = threading.Thread(target=self._loop, daemon=True)
+        self.worker.start()
+
+    def enviar(self, prox_id: int, path: str, payload: dict, espera: float = 5):
+        try:
+            self.fila.put((prox_id, path, payload, time.perf_counter()), timeout=espera)
+        except queue.Full:
+            log.error("[erro] Fila de saída para Nó %s cheia, descartando %s", prox_id, path)
+
+    def _loop(self):
+        while True:
+            prox_id, path, payload, enfileirado = self.fila.get()
+            if path != "/dados/replica":
+                self._entregar(prox_id, path, payload, enfileirado)
+                continue
+            pendentes = [payload]
+            while len(pendentes) < TAMANHO_FILA_SAIDA:
+                try:
+                    pendentes.append(self.fila.get_nowait()[2])
+                except queue.Empty:
+                    break
+            for lote in juntar_replicas(pendentes):
+                self._entregar(prox_id, path, lote, enfileirado)
+
+    def _entregar(self, prox_id: int, path: str, payload: dict, enfileirado: float):
+        inicio = time.perf_counter()
+        try:
+            corpo, tipo = codificar_para(self.url, path, payload)
+            r = self.sessao.post(f"{self.url}{path}", data=corpo, headers={"Content-Type": tipo}, timeout=5)
+            if recusou_formato(self.url, r.status_code, tipo):
+                corpo = codificar(payload)
+                self.sessao.post(f"{self.url}{path}", data=corpo, headers=JSON_HEADERS, timeout=5)
+            registrar_envio(path, len(corpo))
+            registrar_encaminhamento(prox_id, path, enfileirado, inicio, True)
+            log.debug("[enviado] -> Nó %s %s: %s", prox_id, path, payload)
+        except Exception as e:
+            registrar_encaminhamento(prox_id, path, enfileirado, inicio, False)
+            log.error("[erro] Falha ao enviar para Nó %s: %s", prox_id, e)
+            falha_envio(prox_id, path, payload)
+
+
+class CanalSaidaAsync:
+    """Versão asyncio do CanalSaida: uma conexão HTTP/1.1 persistente
+    mantida por uma única tarefa no event loop do nó."""
+
+    def __init__(self, url: str, loop: asyncio.AbstractEventLoop):
+        self.url = url
+        destino = urllib.parse.urlsplit(url)
+        self.host = destino.hostname
+        self.porta = destino.port or 80
+        self.loop = loop
+        self.fila: "asyncio.Queue[Tuple[int, str, dict, float]]" = asyncio.Queue(maxsize=TAMANHO_FILA_SAIDA)
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        loop.call_soon_threadsafe(loop.create_task, self._loop())
+
+    def enviar(self, prox_id: int, path: str, payload: dict, espera: float = 5):
+        # Pode ser chamado de fora do loop (ex.: thread principal); nunca
+        # espera, fila cheia descarta como no CanalSaida
+        self.loop.call_soon_threadsafe(self._enfileirar, (prox_id, path, payload, time.perf_counter()))
+
+    def _enfileirar(self, item: Tuple[int, str, dict, float]):
+        try:
+            self.fila.put_nowait(item)
+        except asyncio.QueueFull:
+            log.error("[erro] Fila de saída para Nó %s cheia, descartando %s", item[0], item[1])
+
+    async def _post(self, path: str, payload: dict) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.porta)
+        corpo, tipo = codificar_para(self.url, path, payload)
+        cabecalho = (
+            f"POST {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.porta}\r\n"
+            f"Content-Type: {tipo}\r\n"
+            f"Content-Length: {len(corpo)}\r\n\r\n"
+        ).encode("latin-1")
+        self.writer.write(cabecalho + corpo)
+        await self.writer.drain()
+        # Lê a resposta inteira para deixar a conexão pronta para a próxima
+        status = await self.reader.readline()
+        if not status:
+            raise ConnectionError("conexão fechada pelo vizinho")
+        _, tamanho, _ = await ler_cabecalhos(self.reader)
+        if tamanho:
+            await self.reader.readexactly(tamanho)
+        if recusou_formato(self.url, int(status.split()[1]), tipo):
+            return await self._post(path, payload)
+        return len(corpo)
+
+    def _fechar(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def _enviar(self, path: str, payload: dict) -> int:
+        if self.writer is not None:
+            try:
+                return await self._post(path, payload)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # A conexão reaproveitada pode ter caído; tenta uma nova antes
+                # de considerar o vizinho inativo
+                self._fechar()
+        return await self._post(path, payload)
+
+    async def _loop(self):
+        while True:
+            prox_id, path, payload, enfileirado = await self.fila.get()
+            if path != "/dados/replica":
+                await self._entregar(prox_id, path, payload, enfileirado)
+                continue
+            pendentes = [payload]
+            while len(pendentes) < TAMANHO_FILA_SAIDA:
+                try:
+                    pendentes.append(self.fila.get_nowait()[2])
+                except asyncio.QueueEmpty:
+                    break
+            for lote in juntar_replicas(pendentes):
+                await self._entregar(prox_id, path, lote, enfileirado)
+
+    async def _entregar(self, prox_id: int, path: str, payload: dict, enfileirado: float):
+        inicio = time.perf_counter()
+        try:
+            tamanho = await asyncio.wait_for(self._enviar(path, payload), timeout=5)
+            registrar_envio(path, tamanho)
+            registrar_encaminhamento(prox_id, path, enfileirado, inicio, True)
+            log.debug("[enviado] -> Nó %s %s: %s", prox_id, path, payload)
+        except Exception as e:
+            registrar_encaminhamento(prox_id, path, enfileirado, inicio, False)
+            log.error("[erro] Falha ao enviar para Nó %s: %s", prox_id, e)
+            self._fechar()
+            falha_envio(prox_id, path, payload)
+
+
+def juntar_replicas(replicas: List[dict]) -> List[dict]:
+    """Junta réplicas de seqs consecutivos em uma mensagem "lote" só"""
+    lotes: List[dict] = []
+    for replica in replicas:
+        itens = replica["lote"] if "lote" in replica else [replica["dado"]]
+        if lotes and lotes[-1]["seq"] + len(lotes[-1]["lote"]) == replica["seq"]:
+            lotes[-1]["lote"].extend(itens)
+        else:
+            lotes.append({"seq": replica["seq"], "lote": list(itens)})
+    return lotes
+
+
+# Réplicas têm canais próprios: a fila delas não atrasa /eleicao e
+# /coordenador, e o worker pode juntar tudo que encontrar nela
+canais: Dict[str, object] = {}
+canais_replica: Dict[str, object] = {}
+canais_lock = threading.Lock()
+loop_async: Optional[asyncio.AbstractEventLoop] = None  # definido no runtime asyncio
+
+
+def obter_canal(url: str, replicas: bool = False):
+    """Retorna (criando se preciso) o canal persistente para a URL; com
+    `replicas` o canal só de /dados/replica"""
+    tabela = canais_replica if replicas else canais
+    with canais_lock:
+        canal = tabela.get(url)
+        if canal is None:
+            if RUNTIME == "asyncio":
+                canal = CanalSaidaAsync(url, loop_async)
+            else:
+                canal = CanalSaida(url)
+            tabela[url] = canal
+        return canal
 
 
 def send_to_next(path: str, payload: dict):
     """Envia mensagem ao próximo nó no anel"""
     prox_id, prox_url = proximo_no()
+    obter_canal(prox_url).enviar(prox_id, path, payload)
+
+
+def falha_envio(prox_id: int, path: str, payload: dict):
+    """Marca o sucessor como inativo e reenvia para o próximo nó vivo,
+    para que o token da eleição não se perca"""
+    if prox_id == ID:
+        return
+    marcar_inativo(prox_id)
+    if path == "/dados/replica":
+        # Réplica vai para um nó específico; ele se atualiza quando voltar
+        return
+    novo_id, _ = proximo_no()
+    log.warning("[membros] Pulando Nó %s, reenviando %s para Nó %s", prox_id, path, novo_id)
+    send_to_next(path, payload)
+
+
+# -------- Rotas (compartilhadas pelos dois runtimes) --------
+# Cada rota devolve (status, corpo JSON ou None). O repasse ao vizinho
+# apenas enfileira no canal, então a resposta sai logo em seguida.
+def tratar_get(path: str) -> Tuple[int, Optional[dict]]:
+    url = urllib.parse.urlsplit(path)
+    if url.path == "/dados":
+        params = urllib.parse.parse_qs(url.query)
+        if "since" not in params and "limit" not in params:
+            with dados_lock:
+                return 200, list(dados)
+        try:
+            since = int(params.get("since", [0])[0])
+            limit = min(int(params.get("limit", [LIMITE_PAGINA])[0]), LIMITE_PAGINA)
+        except ValueError:
+            return 400, None
+        if since < 0 or limit < 1:
+            # since negativo fatiaria do fim da lista; limit < 1 daria "mais" para sempre
+            return 400, None
+        return 200, ler_dados(since, limit)
+    elif path == "/coordenador":
+        return 200, {"coordenador": coordenador_id}
+    elif path == "/membros":
+        with membros_lock:
+            membros = dict(nos_conectados)
+        return 200, {"membros": membros, "inativos": lista_inativos()}
+    elif path == "/estatisticas":
+        with estatisticas_lock:
+            return 200, {"algoritmo": ALGORITMO, "mensagens": dict(mensagens_enviadas),
+                         "bytes": dict(bytes_enviados)}
+    elif path == "/metrics":
+        saida = metricas.exportar()
+        with estatisticas_lock:
+            saida["contadores"]["mensagens_enviadas"] = dict(mensagens_enviadas)
+            saida["contadores"]["bytes_enviados"] = dict(bytes_enviados)
+        return 200, saida
+    return 404, None
+
+
+def tratar_post(path: str, dado: dict) -> Tuple[int, Optional[dict]]:
+    global participante, epoca
+
+    if path == "/eleicao" and ALGORITMO == "chang-roberts":
+        # Aceita também o formato do anel (Cliente.py manda "iniciador")
+        candidato = int(dado.get("candidato", dado.get("iniciador", ID)))
+        with eleicao_lock:
+            # Token sem época (ex.: Cliente.py) abre uma eleição nova
+            epoca_token = int(dado["epoca"]) if "epoca" in dado else epoca + 1
+            situacao = "ok"
+            if epoca_token <= epoca_coordenador:
+                situacao = "antigo"
+            elif epoca_token < epoca:
+                situacao = "suprimido"  # uma eleição mais nova já passou por aqui
+            else:
+                if epoca_token > epoca:
+                    epoca = epoca_token
+                    participante = False
+                if candidato == ID:
+                    participante = False
+                    vencedor = True
+                else:
+                    vencedor = False
+                    if candidato < ID or inativo(candidato):
+                        # Só um token por nó circula: candidatos menores são
+                        # trocados por este nó na primeira vez e descartados depois
+                        candidato = None if participante else ID
+                    participante = True
+        if situacao != "ok":
+            return descartar_token(situacao, epoca_token, int(dado.get("iniciador", candidato)))
+
+        marcar_inicio_eleicao()
+        if vencedor:
+            log.info("[resultado] Coordenador eleito: Nó %s", ID)
+            anunciar_coordenador(ID, epoca_token)
+        elif candidato is not None:
+            send_to_next("/eleicao", {"candidato": candidato, "epoca": epoca_token})
+        return 200, {"status": "ok"}
+
+    elif path == "/eleicao" and ALGORITMO == "bully":
+        iniciar_eleicao()
+        return 200, {"status": "ok"}
+
+    elif path == "/eleicao/bully":
+        # Responder já é o "OK" do Bully: este nó é maior e assume a eleição
+        epoca_desafio = int(dado.get("epoca", epoca + 1))
+        marcar_ativo(int(dado["origem"]))
+        with eleicao_lock:
+            atrasado = epoca_desafio <= epoca_coordenador
+            epoca = max(epoca, epoca_desafio)
+        if atrasado:
+            # O desafiante não viu a última eleição: só conta a ele o resultado
+            return descartar_token("antigo", epoca_desafio, int(dado["origem"]))
+        # Entra na eleição do desafiante, sem abrir outra época
+        marcar_inicio_eleicao()
+        desafiar_maiores()
+        return 200, {"status": "ok"}
+
+    elif path == "/eleicao/iniciar":
+        iniciar_eleicao()
+        return 200, {"status": "ok"}
+
+    elif path == "/dados":
+        if coordenador_id != ID:
+            return encaminhar_ao_coordenador("/dados/sequenciar", dado)
+        if not sequenciador_pronto.is_set():
+            return resposta_sincronizando()
+        seq = sequenciar([dado])
+        return 202, {"status": "ok", "seq": seq, "tamanho": seq}
+
+    elif path == "/dados/batch":
+        # Vários itens (lista JSON) em uma requisição, numerados em sequência
+        if not isinstance(dado, list) or not dado:
+            return 400, {"status": "erro", "motivo": "esperada uma lista JSON de itens"}
+        if coordenador_id != ID:
+            return encaminhar_ao_coordenador("/dados/sequenciar/batch", dado)
+        if not sequenciador_pronto.is_set():
+            return resposta_sincronizando()
+        return 202, resposta_lote(sequenciar(dado), len(dado))
+
+    elif path in ("/dados/sequenciar", "/dados/sequenciar/batch"):
+        # Escrita repassada por um seguidor: só o coordenador numera
+        if coordenador_id != ID:
+            return 503, {"status": "erro", "motivo": f"Nó {ID} não é o coordenador"}
+        if not sequenciador_pronto.is_set():
+            return resposta_sincronizando()
+        if path == "/dados/sequenciar":
+            seq = sequenciar([dado])
+            return 202, {"status": "ok", "seq": seq, "tamanho": seq}
+        return 202, resposta_lote(sequenciar(dado), len(dado))
+
+    elif path == "/dados/replica":
+        # Réplica de uma escrita ("dado") ou de um lote inteiro ("lote")
+        if not aplicar_replica(int(dado["seq"]), dado["lote"] if "lote" in dado else [dado["dado"]]):
+            sincronizar_em_fundo()
+        return 200, {"status": "ok"}
+
+    elif path == "/estatisticas/zerar":
+        with estatisticas_lock:
+            mensagens_enviadas.clear()
+            bytes_enviados.clear()
+        metricas.zerar()
+        return 200, {"status": "ok"}
+
+    elif path == "/eleicao":
+        iniciador = int(dado["iniciador"])
+        ids = [int(x) for x in dado.get("ids", [])]
+        participando = dado.get("participando", {})
+
+        with eleicao_lock:
+            # Token sem época (ex.: Cliente.py) abre uma eleição nova
+            epoca_token = int(dado["epoca"]) if "epoca" in dado else epoca + 1
+            situacao = avaliar_token(epoca_token, iniciador)
+        if situacao != "ok":
+            return descartar_token(situacao, epoca_token, iniciador)
+        marcar_inicio_eleicao()
+
+        # Token já passou por aqui sem voltar ao iniciador: ele caiu no
+        # caminho, então este nó encerra a eleição no lugar dele
+        if ID in ids and iniciador != ID:
+            log.warning("[eleicao] Iniciador Nó %s não responde, encerrando eleição", iniciador)
+            iniciador = ID
+
+        # Marca que este nó está participando
+        if str(ID) not in participando:
+            participando[str(ID)] = True
+        if ID not in ids:
+            ids.append(ID)
+
+        log.info("[eleicao] Nó %s participando da eleição. Estado: %s", ID, participando)
+
+        # Salva o estado (fora do caminho da resposta, exceto com --persistencia segmentos)
+        global ultima_eleicao
+        ultima_eleicao = {"iniciador": iniciador, "ids": ids, "participando": participando}
+        salvar_estado()
+
+        # Repassa a mensagem (a fila do canal não bloqueia a resposta)
+        if iniciador == ID:
+            log.info("[resultado] Coordenador eleito: Nó %s", max(ids))
+            anunciar_coordenador(max(ids), epoca_token)
+        else:
+            payload = {"iniciador": iniciador, "ids": ids, "participando": participando, "epoca": epoca_token}
+            send_to_next("/eleicao", payload)
+        return 200, {"status": "ok"}
+
+    elif path == "/coordenador":
+        novo = int(dado["coordenador"])
+        origem = int(dado["origem"])
+        epoca_anuncio = int(dado.get("epoca", epoca_coordenador))
+        if dado.get("difusao"):
+            marcar_ativo(origem)  # difusão vem direto de quem anuncia
+        if not aceitar_coordenador(novo, epoca_anuncio):
+            # Repetido (outro anúncio da mesma eleição já passou) ou antigo:
+            # não grava nem repassa, então cada anúncio dá no máximo uma volta
+            log.debug("[coordenador] Anúncio ignorado: Nó %s, época %s", novo, epoca_anuncio)
+            return 200, {"status": "ignorado"}
+        salvar_estado()
+        sincronizar_em_fundo()
+        log.info("[coordenador] Anúncio recebido: coordenador é Nó %s (época %s)", novo, epoca_anuncio)
+
+        # Repassa a notícia pelo canal do vizinho (no Bully o vencedor já
+        # avisou cada nó diretamente)
+        prox_id, _ = proximo_no()
+        if prox_id != origem and not dado.get("difusao"):
+            payload = {"coordenador": novo, "origem": origem, "epoca": epoca_anuncio}
+            send_to_next("/coordenador", payload)
+        return 200, {"status": "ok"}
+
+    elif path == "/membros/entrar":
+        no_id = int(dado["id"])
+        origem = int(dado.get("origem", ID))
+        adicionar_membro(no_id, dado["url"])
+
+        # Propaga a entrada pelo anel até voltar a quem a recebeu primeiro
+        prox_id, _ = proximo_no()
+        if prox_id != origem:
+            send_to_next("/membros/entrar", {"id": no_id, "url": dado["url"], "origem": origem})
+        with membros_lock:
+            return 200, {"status": "ok", "membros": dict(nos_conectados),
+                         "coordenador": coordenador_id, "epoca": epoca_coordenador}
+
+    elif path == "/membros/sair":
+        no_id = int(dado["id"])
+        origem = int(dado.get("origem", ID))
+        remover_membro(no_id)
+
+        prox_id, _ = proximo_no()
+        if prox_id != origem:
+            send_to_next("/membros/sair", {"id": no_id, "origem": origem})
+        return 200, {"status": "ok"}
+
+    return 404, None
+
+
+def tratar_corpo(path: str, corpo: bytes, content_type: Optional[str]) -> Tuple[int, Optional[dict]]:
+    """Decodifica o corpo e trata o POST; corpo que não decodifica ou sem
+    os campos que a rota espera vira 400 em vez de derrubar a conexão"""
     try:
-        requests.post(f"{prox_url}{path}", json=payload, timeout=5)
-        print(f"[enviado] -> Nó {prox_id} {path}: {payload}")
-    except Exception as e:
-        print(f"[erro] Falha ao enviar para Nó {prox_id}: {e}")
+        return tratar_post(path, desserializar(corpo, content_type))
+    except FormatoNaoSuportado:
+        return 415, None
+    except (ValueError, KeyError, TypeError) as e:
+        log.warning("[http] POST %s inválido: %r", path, e)
+        return 400, {"status": "erro", "motivo": f"corpo inválido: {e!r}"}
 
 
-# -------- Handlers HTTP --------
+# -------- Handlers HTTP (runtime threads) --------
 class NossoHandler(http.server.BaseHTTPRequestHandler):
+    # HTTP/1.1 mantém a conexão aberta entre mensagens do mesmo vizinho
+    protocol_version = "HTTP/1.1"
+    # Cabeçalho e corpo saem em writes separados; sem isso o Nagle segura
+    # a resposta até o ACK atrasado do cliente (~40 ms por mensagem)
+    disable_nagle_algorithm = True
+
+    def _send_vazio(self, code: int):
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
     def _send_json(self, code: int, payload: dict):
         data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
         self.send_response(code)
@@ -52,92 +701,552 @@ class NossoHandler(http.server.BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(data)
 
-    def _read_json(self) -> dict:
+    def _ler_corpo(self) -> bytes:
         length = int(self.headers.get("Content-Length", 0))
-        body = self.rfile.read(length).decode("utf-8")
-        return json.loads(body) if body else {}
+        return self.rfile.read(length)
 
-    def do_GET(self):
-        if self.path == "/coordenador":
-            self._send_json(200, {"coordenador": coordenador_id})
+    def _responder(self, code: int, payload: Optional[dict]):
+        if payload is None:
+            self._send_vazio(code)
         else:
-            self.send_response(404)
-            self.end_headers()
+            self._send_json(code, payload)
+
+    def do_GET(self):
+        inicio = time.perf_counter()
+        code, payload = tratar_get(self.path)
+        self._responder(code, payload)
+        registrar_requisicao("GET", self.path, code, time.perf_counter() - inicio)
 
     def do_POST(self):
-        global coordenador_id
-
-        if self.path == "/eleicao":
-            dado = self._read_json()
-            iniciador = int(dado["iniciador"])
-            ids = [int(x) for x in dado.get("ids", [])]
-            participando = dado.get("participando", {})
-
-            # Marca que este nó está participando
-            if str(ID) not in participando:
-                participando[str(ID)] = True
-            if ID not in ids:
-                ids.append(ID)
-
-            print(f"[eleicao] Nó {ID} participando da eleição. Estado: {participando}")
-
-            # Salva em arquivo local
-            with open(f"eleicao_node{ID}.json", "w", encoding="utf-8") as f:
-                json.dump({
-                    "iniciador": iniciador,
-                    "ids": ids,
-                    "participando": participando
-                }, f, ensure_ascii=False, indent=2)
-
-            # Responde IMEDIATAMENTE para o nó anterior
-            self._send_json(200, {"status": "ok"})
-
-            # E SÓ DEPOIS, repassa a mensagem em uma thread
-            if iniciador == ID:
-                print(f"[resultado] Coordenador eleito: Nó {max(ids)}")
-                # Usar thread aqui também é uma boa prática
-                threading.Thread(target=anunciar_coordenador, args=(max(ids),)).start()
+        inicio = time.perf_counter()
+        code, payload = tratar_corpo(self.path, self._ler_corpo(), self.headers.get("Content-Type"))
+        self._responder(code, payload)
+        registrar_requisicao("POST", self.path, code, time.perf_counter() - inicio)
+
+    def log_message(self, format, *args):
+        # Cada requisição já entra no /metrics; a linha por acesso só em DEBUG
+        log.debug("[http] %s %s", self.address_string(), format % args)
+
+
+# -------- Runtime asyncio --------
+async def ler_cabecalhos(reader: asyncio.StreamReader) -> Tuple[Dict[str, str], int, bool]:
+    """Lê os cabeçalhos HTTP; devolve (cabeçalhos, Content-Length, keep-alive)"""
+    headers: Dict[str, str] = {}
+    while True:
+        linha = await reader.readline()
+        if linha in (b"\r\n", b"\n", b""):
+            break
+        nome, _, valor = linha.decode("latin-1").partition(":")
+        headers[nome.strip().lower()] = valor.strip()
+    tamanho = int(headers.get("content-length", 0))
+    return headers, tamanho, headers.get("connection", "").lower() != "close"
+
+
+async def atender_conexao(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Atende uma conexão HTTP/1.1 keep-alive com o mesmo contrato do NossoHandler"""
+    try:
+        while True:
+            linha = await reader.readline()
+            if not linha:
+                break
+            metodo, path, _ = linha.decode("latin-1").split(" ", 2)
+            headers, tamanho, manter = await ler_cabecalhos(reader)
+            corpo = await reader.readexactly(tamanho) if tamanho else b""
+            inicio = time.perf_counter()
+
+            if metodo == "GET":
+                code, payload = tratar_get(path)
+            elif metodo == "POST":
+                tipo = headers.get("content-type")
+                if path in ("/dados", "/dados/batch") or (persistencia.bloqueia
+                                                          and path in ("/eleicao", "/coordenador")):
+                    # Seguidores repassam a escrita ao coordenador de forma síncrona,
+                    # e a persistência em segmentos espera o fsync
+                    code, payload = await asyncio.get_running_loop().run_in_executor(
+                        None, tratar_corpo, path, corpo, tipo)
+                else:
+                    code, payload = tratar_corpo(path, corpo, tipo)
             else:
-                payload = {"iniciador": iniciador, "ids": ids, "participando": participando}
-                # Repassa para o próximo em uma tarefa de fundo
-                threading.Thread(target=send_to_next, args=("/eleicao", payload)).start()
+                code, payload = 501, None
+
+            data = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            cabecalho = f"HTTP/1.1 {code} {http.HTTPStatus(code).phrase}\r\n"
+            if payload is not None:
+                cabecalho += "Content-Type: application/json; charset=utf-8\r\n"
+            cabecalho += f"Content-Length: {len(data)}\r\n\r\n"
+            writer.write(cabecalho.encode("latin-1") + data)
+            await writer.drain()
+            registrar_requisicao(metodo, path, code, time.perf_counter() - inicio)
+            if not manter:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError, KeyError) as e:
+        log.error("[erro] Conexão encerrada: %s", e)
+    finally:
+        writer.close()
+
+
+async def servir_asyncio(reiniciando: bool):
+    global loop_async
+    loop_async = asyncio.get_running_loop()
+    servidor = await asyncio.start_server(atender_conexao, "", PORT, reuse_address=True)
+    async with servidor:
+        log.info("Nó %s servindo em porta %s (asyncio)", ID, PORT)
+        await loop_async.run_in_executor(None, ao_iniciar, reiniciando)
+        await servidor.serve_forever()
+
+
+# -------- Entrada e saída do anel --------
+def entrar_no_anel(semente: str):
+    """Pede a um nó já no anel para nos incluir e adota a tabela que ele devolve"""
+    r = requests.post(f"{semente.rstrip('/')}/membros/entrar",
+                      json={"id": ID, "url": MINHA_URL}, timeout=5)
+    resposta = r.json()
+    membros = resposta["membros"]
+    with membros_lock:
+        nos_conectados.update({str(k): v for k, v in membros.items()})
+        _reindexar()
+    if resposta.get("coordenador") is not None and aceitar_coordenador(int(resposta["coordenador"]),
+                                                                       int(resposta.get("epoca", 0))):
+        salvar_estado()
+    log.info("[membros] Nó %s entrou no anel via %s: %s", ID, semente, ids_ordenados)
+
+
+def reentrar_no_anel():
+    """Nó reiniciado: reanuncia a entrada para os outros pararem de pulá-lo
+    e puxa os dados que perdeu enquanto esteve fora"""
+    with membros_lock:
+        pos = bisect.bisect_right(ids_ordenados, ID)
+        ordem = ids_ordenados[pos:] + ids_ordenados[:pos]
+        urls = [nos_conectados[str(i)] for i in ordem if i != ID]
+    for url in urls:
+        try:
+            entrar_no_anel(url)
+            break
+        except (requests.RequestException, ValueError, KeyError):
+            continue
+    sincronizar_em_fundo()
+
+
+def ao_iniciar(reiniciando: bool):
+    """Passos de entrada no anel, depois que o servidor já está escutando"""
+    if args.entrar:
+        entrar_no_anel(args.entrar)
+    elif reiniciando:
+        reentrar_no_anel()
+    elif ID == 1:
+        # Apenas nó 1 inicia eleição no começo
+        iniciar_eleicao()
+
+
+def sair_do_anel():
+    """Avisa o sucessor (que propaga ao resto) que este nó está saindo"""
+    prox_id, prox_url = proximo_no()
+    if prox_id == ID:
+        return
+    try:
+        requests.post(f"{prox_url}/membros/sair", json={"id": ID, "origem": ID}, timeout=2)
+    except requests.RequestException as e:
+        log.error("[erro] Falha ao anunciar saída: %s", e)
+
+
+# -------- Lógica da eleição --------
+def salvar_estado():
+    persistencia.salvar({"eleicao": ultima_eleicao, "coordenador": coordenador_id,
+                         "epoca": epoca, "epoca_coordenador": epoca_coordenador})
+
+
+def destinos_heartbeat() -> List[Tuple[str, int]]:
+    """Endereços UDP (mesma porta do HTTP) dos outros membros"""
+    with membros_lock:
+        urls = [url for i, url in nos_conectados.items() if i != str(ID)]
+    destinos = []
+    for url in urls:
+        partes = urllib.parse.urlsplit(url)
+        destinos.append((partes.hostname, partes.port or 80))
+    return destinos
+
+
+def suspeitar_coordenador(suspeito: int):
+    """Chamado pelo detector de falhas quando o coordenador para de bater"""
+    log.warning("[heartbeat] Coordenador Nó %s parou de responder, iniciando eleição", suspeito)
+    marcar_inativo(suspeito)
+    iniciar_eleicao()
+
+
+def recuperar_estado() -> bool:
+    """Retoma o último estado gravado antes de o nó cair; True se havia estado"""
+    global coordenador_id, ultima_eleicao, epoca, epoca_coordenador
+    estado = persistencia.recuperar()
+    if estado:
+        coordenador_id = estado.get("coordenador")
+        ultima_eleicao = estado.get("eleicao", {})
+        epoca_coordenador = estado.get("epoca_coordenador", 0)
+        epoca = max(estado.get("epoca", 0), epoca_coordenador)
+        log.info("[persistencia] Estado recuperado: coordenador Nó %s (época %s), eleição %s",
+                 coordenador_id, epoca_coordenador, ultima_eleicao)
+    return bool(estado)
+
+
+eleicao_lock = threading.Lock()
+participante = False  # Chang-Roberts: já repassou um token nesta eleição
+maior_eleicao = (0, 0)  # anel: (época, iniciador) do token de maior prioridade visto
+bully_em_andamento = False
+coordenador_definido = threading.Event()
+inicio_eleicao: Optional[float] = None  # perf_counter do início da eleição em curso
+tempo_eleicao_lock = threading.Lock()
+
+# Bully fala direto com qualquer nó, fora da ordem do anel
+sessao_direta = requests.Session()
+sessao_direta.mount("http://", HTTPAdapter(pool_maxsize=32))
+executor_direto = concurrent.futures.ThreadPoolExecutor(max_workers=32)
+
+
+def post_direto(no_id: int, url: str, path: str, payload: dict) -> bool:
+    """POST síncrono a um nó específico; False se ele não respondeu"""
+    corpo, tipo = codificar_para(url, path, payload)
+    try:
+        r = sessao_direta.post(f"{url}{path}", data=corpo, headers={"Content-Type": tipo}, timeout=2)
+        if recusou_formato(url, r.status_code, tipo):
+            corpo = codificar(payload)
+            sessao_direta.post(f"{url}{path}", data=corpo, headers=JSON_HEADERS, timeout=2)
+    except requests.RequestException as e:
+        log.error("[erro] Nó %s não respondeu a %s: %s", no_id, path, e)
+        marcar_inativo(no_id)
+        return False
+    registrar_envio(path, len(corpo))
+    return True
+
+
+def difundir(path: str, payload: dict, destinos: List[Tuple[int, str]]) -> List[bool]:
+    """Envia a mesma mensagem a vários nós em paralelo"""
+    futuros = [executor_direto.submit(post_direto, no_id, url, path, payload) for no_id, url in destinos]
+    return [f.result() for f in futuros]
+
+
+def desafiar_maiores():
+    """Bully: roda eleicao_bully na época atual (não faz nada se já roda)"""
+    threading.Thread(target=eleicao_bully, daemon=True).start()
+
+
+def eleicao_bully():
+    """Desafia todos os ids maiores; sem resposta, este nó é o coordenador"""
+    global bully_em_andamento
+    with eleicao_lock:
+        if bully_em_andamento:
             return
+        bully_em_andamento = True
+    try:
+        while True:
+            coordenador_definido.clear()
+            with membros_lock:
+                maiores = [(i, nos_conectados[str(i)]) for i in ids_ordenados
+                           if i > ID and not inativo(i)]
+            if not any(difundir("/eleicao/bully", {"origem": ID, "epoca": epoca}, maiores)):
+                log.info("[resultado] Coordenador eleito: Nó %s", ID)
+                anunciar_coordenador(ID, epoca)
+                return
+            # Um nó maior assumiu; se o anúncio não vier, desafia de novo
+            if coordenador_definido.wait(TIMEOUT_BULLY):
+                return
+    finally:
+        with eleicao_lock:
+            bully_em_andamento = False
 
-        elif self.path == "/coordenador":
-            dado = self._read_json()
-            coordenador_id = dado["coordenador"]
-            origem = int(dado["origem"])
-            print(f"[coordenador] Anúncio recebido: coordenador é Nó {coordenador_id}")
 
-            # Responde IMEDIATAMENTE
-            self._send_json(200, {"status": "ok"})
+def marcar_inicio_eleicao():
+    """Primeiro sinal de eleição visto por este nó (iniciou ou recebeu token)"""
+    global inicio_eleicao
+    with tempo_eleicao_lock:
+        if inicio_eleicao is None:
+            inicio_eleicao = time.perf_counter()
 
-            # E repassa a notícia em uma thread
-            prox_id, _ = proximo_no()
-            if prox_id != origem:
-                payload = {"coordenador": coordenador_id, "origem": origem}
-                threading.Thread(target=send_to_next, args=("/coordenador", payload)).start()
 
+def concluir_eleicao():
+    """Coordenador conhecido: registra quanto tempo este nó ficou sem ele"""
+    global inicio_eleicao
+    with tempo_eleicao_lock:
+        if inicio_eleicao is None:
             return
+        duracao, inicio_eleicao = time.perf_counter() - inicio_eleicao, None
+    metricas.observar("tempo_eleicao", ALGORITMO, duracao)
 
-        self.send_response(404)
-        self.end_headers()
+
+def eleicao_em_curso() -> bool:
+    """Há uma eleição em andamento que ainda não estourou TIMEOUT_ELEICAO"""
+    with tempo_eleicao_lock:
+        return inicio_eleicao is not None and time.perf_counter() - inicio_eleicao < TIMEOUT_ELEICAO
+
+
+def avaliar_token(epoca_token: int, iniciador: int) -> str:
+    """Anel: "ok" se o token deve seguir, "antigo" se a eleição dele já foi
+    decidida, "suprimido" se um token de maior prioridade (época maior ou
+    mesma época e iniciador maior) já passou por aqui. Chamar com eleicao_lock."""
+    global epoca, maior_eleicao
+    if epoca_token <= epoca_coordenador:
+        return "antigo"
+    if (epoca_token, iniciador) < maior_eleicao:
+        return "suprimido"
+    maior_eleicao = (epoca_token, iniciador)
+    epoca = max(epoca, epoca_token)
+    return "ok"
+
+
+def descartar_token(situacao: str, epoca_token: int, iniciador: int) -> Tuple[int, dict]:
+    """Não repassa o token. Se o iniciador está atrasado (a eleição dele já
+    foi decidida), avisa só ele do coordenador atual."""
+    metricas.contar("tokens_descartados", situacao)
+    log.debug("[eleicao] Token %s descartado: época %s, iniciador Nó %s", situacao, epoca_token, iniciador)
+    with membros_lock:
+        url = nos_conectados.get(str(iniciador))
+    # Mesma época também conta: o iniciador pode ter perdido o anúncio
+    if situacao == "antigo" and epoca_token <= epoca_coordenador and url and iniciador != ID:
+        anuncio = {"coordenador": coordenador_id, "origem": ID, "difusao": True, "epoca": epoca_coordenador}
+        executor_direto.submit(post_direto, iniciador, url, "/coordenador", anuncio)
+    return 200, {"status": "ignorado"}
+
+
+def aceitar_coordenador(novo: int, epoca_anuncio: int) -> bool:
+    """Adota `novo` se o anúncio é mais recente que o atual: época maior, ou
+    mesma época e id maior. Repetidos e antigos devolvem False."""
+    global coordenador_id, epoca_coordenador, epoca, participante
+    with eleicao_lock:
+        if (epoca_anuncio, novo) <= (epoca_coordenador, coordenador_id or 0):
+            return False
+        epoca = max(epoca, epoca_anuncio)
+        # Regra do Bully: um nó menor não coordena este; a eleição própria
+        # anuncia este nó na mesma época, que vence pelo id
+        recusar = ALGORITMO == "bully" and novo < ID
+        if not recusar:
+            if novo == ID:
+                # Só numera escritas depois de puxar o que os outros já têm
+                sequenciador_pronto.clear()
+            coordenador_id, epoca_coordenador = novo, epoca_anuncio
+            participante = False
+    if recusar:
+        log.info("[coordenador] Anúncio do Nó %s recusado, Nó %s é maior", novo, ID)
+        desafiar_maiores()
+        return False
+    coordenador_definido.set()
+    concluir_eleicao()
+    return True
 
 
-# -------- Lógica da eleição --------
 def iniciar_eleicao():
-    """Inicia uma eleição no anel"""
-    print(f"[iniciar] Nó {ID} iniciou eleição")
-    payload = {"iniciador": ID, "ids": [ID], "participando": {str(ID): True}}
-    send_to_next("/eleicao", payload)
+    """Inicia uma eleição no anel, ou se junta à que já está em andamento"""
+    global participante, epoca, maior_eleicao
+    with eleicao_lock:
+        # No Bully quem recebe um desafio precisa desafiar os maiores mesmo
+        # participando; a repetição ali é evitada por bully_em_andamento
+        if ALGORITMO != "bully" and eleicao_em_curso():
+            log.info("[iniciar] Eleição já em andamento, Nó %s aguarda o resultado", ID)
+            return
+        if ALGORITMO == "bully" and bully_em_andamento:
+            # Já desafiando os maiores: a época só sobe numa eleição nova
+            log.info("[iniciar] Nó %s já está desafiando os maiores", ID)
+            return
+        epoca += 1
+        minha_epoca = epoca
+        if ALGORITMO == "chang-roberts":
+            participante = True
+        else:
+            maior_eleicao = (minha_epoca, ID)
+    log.info("[iniciar] Nó %s iniciou eleição (%s, época %s)", ID, ALGORITMO, minha_epoca)
+    marcar_inicio_eleicao()
+    if ALGORITMO == "chang-roberts":
+        send_to_next("/eleicao", {"candidato": ID, "epoca": minha_epoca})
+    elif ALGORITMO == "bully":
+        desafiar_maiores()
+    else:
+        payload = {"iniciador": ID, "ids": [ID], "participando": {str(ID): True}, "epoca": minha_epoca}
+        send_to_next("/eleicao", payload)
 
 
-def anunciar_coordenador(vencedor: int):
+def vigiar_eleicao():
+    """Refaz a eleição (com época nova) se o anúncio não chega a tempo,
+    por exemplo porque o token de maior prioridade se perdeu"""
+    global inicio_eleicao
+    while True:
+        time.sleep(TIMEOUT_ELEICAO / 2)
+        with tempo_eleicao_lock:
+            if inicio_eleicao is None or time.perf_counter() - inicio_eleicao < TIMEOUT_ELEICAO:
+                continue
+            inicio_eleicao = None
+        log.warning("[eleicao] Nenhum anúncio em %ss, refazendo a eleição", TIMEOUT_ELEICAO)
+        iniciar_eleicao()
+
+
+def anunciar_coordenador(vencedor: int, epoca_eleicao: int):
     """Anuncia o vencedor a todos no anel"""
-    payload = {"coordenador": vencedor, "origem": ID}
+    # O anúncio para antes de voltar a quem o originou, então o próprio
+    # nó registra o resultado aqui
+    if not aceitar_coordenador(vencedor, epoca_eleicao):
+        return  # outro anúncio igual ou mais novo já chegou
+    salvar_estado()
+    if vencedor == ID:
+        sincronizar_em_fundo()
+    payload = {"coordenador": vencedor, "origem": ID, "epoca": epoca_eleicao}
+    if ALGORITMO == "bully":
+        with membros_lock:
+            outros = [(int(i), url) for i, url in nos_conectados.items() if int(i) != ID]
+        difundir("/coordenador", dict(payload, difusao=True), outros)
+        return
     send_to_next("/coordenador", payload)
 
 
+# -------- Dados replicados (/dados) --------
+# O coordenador é o sequenciador: só ele numera as escritas, que seguem de
+# forma assíncrona para os seguidores pelos canais persistentes. Qualquer
+# nó responde leituras com a cópia local.
+dados: List[dict] = []  # dados[seq - 1] é o item de número seq
+dados_lock = threading.Lock()
+replicas_fora_de_ordem: Dict[int, dict] = {}
+sincronizacao_lock = threading.Lock()
+sincronizacao_pendente = False  # pedido que chegou com uma sincronização em curso
+sequenciador_pronto = threading.Event()  # coordenador já sincronizou após a eleição
+
+
+def ler_dados(since: int, limit: int) -> dict:
+    with dados_lock:
+        pagina = dados[since:since + limit]
+        total = len(dados)
+    itens = [{"seq": since + i + 1, "dado": d} for i, d in enumerate(pagina)]
+    return {"itens": itens, "tamanho": total, "mais": since + len(pagina) < total}
+
+
+def sequenciar(itens: List[dict]) -> int:
+    """Numera e grava as escritas localmente, em ordem, e devolve o seq da
+    última; a replicação (uma mensagem por lote) não bloqueia a resposta"""
+    with membros_lock:
+        seguidores = [(int(i), url) for i, url in nos_conectados.items()
+                      if int(i) != ID and not inativo(int(i))]
+    with dados_lock:
+        dados.extend(itens)
+        seq = len(dados)
+        if len(itens) == 1:
+            replica = {"seq": seq, "dado": itens[0]}
+        else:
+            replica = {"seq": seq - len(itens) + 1, "lote": itens}
+        # Ainda com o lock, para cada fila receber as réplicas na ordem dos
+        # seqs; fila cheia não segura as escritas (o seguidor sincroniza o buraco)
+        for no_id, url in seguidores:
+            obter_canal(url, replicas=True).enviar(no_id, "/dados/replica", replica, espera=0)
+    return seq
+
+
+def resposta_sincronizando() -> Tuple[int, dict]:
+    # ClienteAnel repete a escrita ao receber 503
+    return 503, {"status": "erro", "motivo": f"coordenador Nó {ID} ainda sincronizando"}
+
+
+def resposta_lote(ultimo: int, quantidade: int) -> dict:
+    return {"status": "ok", "primeiro": ultimo - quantidade + 1, "ultimo": ultimo,
+            "quantidade": quantidade, "tamanho": ultimo}
+
+
+def aplicar_replica(seq: int, itens: List[dict]) -> bool:
+    """Aplica os itens a partir de `seq` na ordem (guarda o que chegar
+    adiantado); False se ainda há buraco. Um seq que este nó já tem com
+    outro item é conflito: fica a versão recebida, que vem do sequenciador."""
+    with dados_lock:
+        for i, dado in enumerate(itens, seq):
+            if i > len(dados):
+                replicas_fora_de_ordem[i] = dado
+            elif dados[i - 1] != dado:
+                log.error("[erro] Conflito no seq %s: %s substituído por %s", i, dados[i - 1], dado)
+                metricas.contar("conflitos_replica", f"Nó {coordenador_id}")
+                dados[i - 1] = dado
+        while len(dados) + 1 in replicas_fora_de_ordem:
+            dados.append(replicas_fora_de_ordem.pop(len(dados) + 1))
+        return not replicas_fora_de_ordem
+
+
+def encaminhar_ao_coordenador(path: str, dado) -> Tuple[int, Optional[dict]]:
+    with membros_lock:
+        url = nos_conectados.get(str(coordenador_id))
+    if url is None:
+        return 503, {"status": "erro", "motivo": "coordenador desconhecido"}
+    try:
+        r = sessao_direta.post(f"{url}{path}", data=codificar(dado), headers=JSON_HEADERS, timeout=5)
+        return r.status_code, r.json()
+    except (requests.RequestException, ValueError) as e:
+        return 503, {"status": "erro", "motivo": f"coordenador Nó {coordenador_id} indisponível: {e}"}
+
+
+def sincronizar(url: str):
+    """Busca em `url` os itens depois do último que este nó tem"""
+    mais = True
+    while mais:
+        with dados_lock:
+            since = len(dados)
+        pagina = sessao_direta.get(f"{url}/dados", params={"since": since}, timeout=5).json()
+        for item in pagina["itens"]:
+            aplicar_replica(item["seq"], [item["dado"]])
+        mais = pagina["mais"] and bool(pagina["itens"])
+
+
+def sincronizar_em_fundo():
+    """Seguidor: puxa do coordenador o que perdeu. Coordenador novo: puxa de
+    cada membro vivo o que eles tiverem além dele (todas as cópias são
+    prefixos da mesma sequência). O coordenador só libera o sequenciador
+    depois disso."""
+    global sincronizacao_pendente
+    sincronizacao_pendente = True
+
+    def tarefa():
+        global sincronizacao_pendente
+        while sincronizacao_pendente:
+            # Se outra tarefa já sincroniza, ela vê o pedido pendente e repete
+            if not sincronizacao_lock.acquire(blocking=False):
+                return
+            try:
+                while sincronizacao_pendente:
+                    sincronizacao_pendente = False
+                    sincronizar_uma_vez()
+            finally:
+                sincronizacao_lock.release()
+
+    executor_direto.submit(tarefa)
+
+
+def sincronizar_uma_vez():
+    with membros_lock:
+        coordenador = coordenador_id == ID
+        if coordenador:
+            fontes = [url for i, url in nos_conectados.items()
+                      if int(i) != ID and not inativo(int(i))]
+        else:
+            fontes = [nos_conectados[str(coordenador_id)]] if str(coordenador_id) in nos_conectados else []
+    for url in fontes:
+        try:
+            sincronizar(url)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            # Membro que não responde não tem como contribuir com itens
+            log.error("[dados] Falha ao sincronizar com %s: %s", url, e)
+    if coordenador and coordenador_id == ID:
+        sequenciador_pronto.set()
+        log.info("[dados] Sincronizado após a eleição, sequenciando a partir do seq %s", len(dados) + 1)
+
+
+# -------- Medidores do /metrics (lidos só na hora da consulta) --------
+def _filas_saida() -> Dict[str, int]:
+    with canais_lock:
+        return {url: canal.fila.qsize() for url, canal in canais.items()}
+
+
+def _filas_replica() -> Dict[str, int]:
+    with canais_lock:
+        return {url: canal.fila.qsize() for url, canal in canais_replica.items()}
+
+
+metricas.medidor("threads_ativas", threading.active_count)
+metricas.medidor("filas_saida", _filas_saida)
+metricas.medidor("filas_replica", _filas_replica)
+metricas.medidor("coordenador", lambda: coordenador_id)
+metricas.medidor("membros", lambda: len(nos_conectados))
+metricas.medidor("inativos", lista_inativos)
+metricas.medidor("dados", lambda: len(dados))
+
+
 # -------- Servidor --------
 class ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     daemon_threads = True
@@ -145,9 +1254,21 @@ class ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
 
 
 if __name__ == "__main__":
-    with ThreadingTCPServer(("", PORT), NossoHandler) as httpd:
-        print(f"Nó {ID} servindo em porta {PORT}")
-        if ID == 1:
-            # Apenas nó 1 inicia eleição no começo
-            iniciar_eleicao()
-        httpd.serve_forever()
+    reiniciando = recuperar_estado()
+    threading.Thread(target=vigiar_eleicao, daemon=True).start()
+    if args.heartbeat > 0:
+        MonitorHeartbeat(ID, PORT, args.heartbeat, args.limiar_phi, destinos_heartbeat,
+                         lambda: coordenador_id, suspeitar_coordenador).iniciar()
+    if RUNTIME == "asyncio":
+        try:
+            asyncio.run(servir_asyncio(reiniciando))
+        except KeyboardInterrupt:
+            sair_do_anel()
+    else:
+        with ThreadingTCPServer(("", PORT), NossoHandler) as httpd:
+            log.info("Nó %s servindo em porta %s", ID, PORT)
+            ao_iniciar(reiniciando)
+            try:
+                httpd.serve_forever()
+            except KeyboardInterrupt:
+                sair_do_anel()